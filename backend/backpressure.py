@@ -0,0 +1,252 @@
+"""
+Bounded concurrency per route class
+
+API requests are split into public reads, public writes (the contact form
+and status pings) and admin calls. Each class gets its own limit on
+concurrent handlers and a bounded queue with a wait deadline, so a burst
+of list queries cannot starve contact form submissions of storage
+connections. A request that finds its queue full, or waits longer than the
+deadline, gets a 503 with Retry-After.
+
+In multi-tenant mode each tenant also gets its own, smaller bulkhead per
+class (BACKPRESSURE_TENANT_SHARE of the limit and queue), passed before the
+shared one, so one busy site cannot fill the shared queue and starve the
+others while the worker-wide bound stays in place. Limits are per worker
+process, as are the metrics served at /metrics/backpressure (see
+health.py).
+"""
+
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import tenancy
+from config import Settings
+from resilience import PUBLIC_READ_PREFIXES
+
+PUBLIC_READ = "public_read"
+PUBLIC_WRITE = "public_write"
+ADMIN = "admin"
+
+PUBLIC_WRITE_PATHS = ("/api/contact", "/api/status")
+
+# Upper bounds (seconds) of the queue wait histogram buckets
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def classify(method: str, path: str) -> Optional[str]:
+    if not path.startswith("/api/"):
+        return None
+    if method in ("GET", "HEAD") and path.startswith(PUBLIC_READ_PREFIXES):
+        return PUBLIC_READ
+    if method == "POST" and path in PUBLIC_WRITE_PATHS:
+        return PUBLIC_WRITE
+    return ADMIN
+
+
+class Rejected(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__()
+        self.retry_after = retry_after
+
+
+class Bulkhead:
+    """At most `limit` concurrent holders, with a bounded FIFO queue of waiters"""
+
+    def __init__(self, limit: int, max_queue: int, timeout: float):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.in_flight = 0
+        self._waiters: deque = deque()
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.wait_count = 0
+        self.wait_sum = 0.0
+        self.wait_max = 0.0
+        self.wait_buckets = [0] * len(WAIT_BUCKETS)
+
+    def _record_wait(self, seconds: float) -> None:
+        self.admitted += 1
+        self.wait_count += 1
+        self.wait_sum += seconds
+        self.wait_max = max(self.wait_max, seconds)
+        for i, bound in enumerate(WAIT_BUCKETS):
+            if seconds <= bound:
+                self.wait_buckets[i] += 1
+                break
+
+    async def acquire(self, timeout: Optional[float] = None) -> None:
+        """Take a slot, waiting at most timeout seconds (default: the bulkhead's own)"""
+        timeout = self.timeout if timeout is None else max(0.0, timeout)
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            self._record_wait(0.0)
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.rejected_queue_full += 1
+            raise Rejected(self.timeout)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            # The slot may have been handed over just as the deadline passed
+            if not waiter.done():
+                waiter.cancel()
+                self._waiters.remove(waiter)
+                self.rejected_timeout += 1
+                raise Rejected(self.timeout)
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            raise
+        self._record_wait(time.perf_counter() - started)
+
+    def release(self) -> None:
+        # Hand the slot straight to the next waiter, so in_flight never dips
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def metrics(self) -> dict:
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(WAIT_BUCKETS, self.wait_buckets):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        buckets["+Inf"] = self.wait_count
+        return {
+            "limit": self.limit,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.timeout,
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "wait_seconds": {
+                "count": self.wait_count,
+                "sum": self.wait_sum,
+                "max": self.wait_max,
+                "buckets": buckets,
+            },
+        }
+
+
+_limits: Dict[str, Tuple[int, int, float]] = {}
+_tenant_share = 1.0
+# One bulkhead per route class bounds the whole worker; in multi-tenant mode
+# each tenant also gets a smaller one of its own, acquired first
+_shared: Dict[str, Bulkhead] = {}
+_per_tenant: Dict[Tuple[str, str], Bulkhead] = {}
+
+
+def configure(settings: Settings) -> None:
+    """Set the limits of every route class with a non-zero limit"""
+    global _tenant_share
+    limits: Dict[str, Tuple[int, int, float]] = {
+        PUBLIC_READ: settings.backpressure_public_read,
+        PUBLIC_WRITE: settings.backpressure_public_write,
+        ADMIN: settings.backpressure_admin,
+    }
+    _limits.clear()
+    _shared.clear()
+    _per_tenant.clear()
+    _tenant_share = settings.backpressure_tenant_share
+    _limits.update({name: limit for name, limit in limits.items() if limit[0] > 0})
+    for name in _limits:
+        for tenant in tenancy.tenants():
+            get_bulkheads(tenant, name)
+
+
+def _tenant_limits(route_class: str) -> Tuple[int, int, float]:
+    limit, max_queue, timeout = _limits[route_class]
+    return max(1, math.ceil(limit * _tenant_share)), max(1, math.ceil(max_queue * _tenant_share)), timeout
+
+
+def get_bulkheads(tenant: str, route_class: Optional[str]) -> List[Bulkhead]:
+    """Bulkheads a request must pass, in acquisition order; empty if the class is unlimited"""
+    if route_class not in _limits:
+        return []
+    if route_class not in _shared:
+        _shared[route_class] = Bulkhead(*_limits[route_class])
+    if not tenancy.enabled():
+        return [_shared[route_class]]
+    key = (tenant, route_class)
+    if key not in _per_tenant:
+        _per_tenant[key] = Bulkhead(*_tenant_limits(route_class))
+    return [_per_tenant[key], _shared[route_class]]
+
+
+def metrics() -> dict:
+    """Metrics per route class, plus per tenant in multi-tenant mode"""
+    shared = {name: bulkhead.metrics() for name, bulkhead in _shared.items()}
+    if not tenancy.enabled():
+        return shared
+    by_tenant: Dict[str, dict] = {}
+    for (tenant, name), bulkhead in _per_tenant.items():
+        by_tenant.setdefault(tenant, {})[name] = bulkhead.metrics()
+    return {"shared": shared, "tenants": by_tenant}
+
+
+class BackpressureMiddleware:
+    def __init__(self, app, settings: Settings):
+        self.app = app
+        configure(settings)
+
+    async def __call__(self, scope, receive, send):
+        bulkheads = []
+        if scope["type"] == "http":
+            bulkheads = get_bulkheads(tenancy.current_tenant(), classify(scope["method"], scope["path"]))
+        if not bulkheads:
+            await self.app(scope, receive, send)
+            return
+
+        # One queue wait deadline across the tenant and shared bulkheads
+        deadline = time.monotonic() + bulkheads[0].timeout
+        acquired = []
+        try:
+            for bulkhead in bulkheads:
+                await bulkhead.acquire(deadline - time.monotonic())
+                acquired.append(bulkhead)
+        except Rejected as e:
+            for bulkhead in acquired:
+                bulkhead.release()
+            await self._reject(send, e.retry_after)
+            return
+        except BaseException:
+            for bulkhead in acquired:
+                bulkhead.release()
+            raise
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            for bulkhead in reversed(acquired):
+                bulkhead.release()
+
+    @staticmethod
+    async def _reject(send, retry_after: float) -> None:
+        body = json.dumps({"detail": "Server busy, retry later"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Logging latency benchmark
+
+Runs many concurrent asyncio tasks that log on every simulated request and
+reports how long each logging call holds the event loop, first with the old
+synchronous basicConfig handler and then with the queue-based pipeline from
+logging_setup. A deliberately slow sink (--sink-delay-ms) stands in for a
+congested stdout pipe or log shipper.
+
+Usage (from backend/):
+    python benchmarks/logging_bench.py --tasks 200 --requests 50 --sink-delay-ms 0.2
+"""
+
+import argparse
+import asyncio
+import io
+import logging
+import os
+import statistics
+import sys
+import time
+from dataclasses import replace
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "bench")
+
+from config import get_settings  # noqa: E402
+from logging_setup import request_id_var, setup_logging, stop_logging  # noqa: E402
+
+
+class SlowStream(io.StringIO):
+    """In-memory stream whose writes take a fixed amount of time"""
+
+    def __init__(self, delay: float):
+        super().__init__()
+        self.delay = delay
+
+    def write(self, data):
+        if self.delay:
+            time.sleep(self.delay)
+        return super().write(data)
+
+
+async def simulated_request(logger: logging.Logger, index: int, requests: int, samples: list) -> None:
+    request_id_var.set(f"req-{index}")
+    for n in range(requests):
+        started = time.perf_counter()
+        logger.info("Handled request %s", n, extra={"route": "/api/portfolio"})
+        samples.append(time.perf_counter() - started)
+        await asyncio.sleep(0)
+
+
+async def run(logger: logging.Logger, tasks: int, requests: int) -> tuple:
+    samples = []
+    started = time.perf_counter()
+    await asyncio.gather(*(simulated_request(logger, i, requests, samples) for i in range(tasks)))
+    return samples, time.perf_counter() - started
+
+
+def report(name: str, samples: list, elapsed: float) -> None:
+    samples.sort()
+    p99 = samples[int(len(samples) * 0.99) - 1]
+    print(
+        f"{name:<26} per call p50 {statistics.median(samples) * 1e6:8.1f} us"
+        f"   p99 {p99 * 1e6:8.1f} us   total {elapsed:6.2f} s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--sink-delay-ms", type=float, default=0.2)
+    parser.add_argument("--sample-rate", type=float, default=1.0, help="LOG_INFO_SAMPLE_RATE for the queue run")
+    args = parser.parse_args()
+    delay = args.sink_delay_ms / 1000
+    logger = logging.getLogger("bench")
+
+    # Before: synchronous handler writing on the event loop
+    root = logging.getLogger()
+    handler = logging.StreamHandler(SlowStream(delay))
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    root.handlers = [handler]
+    root.setLevel(logging.INFO)
+    samples, elapsed = asyncio.run(run(logger, args.tasks, args.requests))
+    report("sync basicConfig handler", samples, elapsed)
+
+    # After: queue handler, JSON formatting and I/O on the listener thread
+    settings = replace(
+        get_settings(),
+        log_level="INFO", log_format="json", log_info_sample_rate=1.0,
+        log_queue_size=args.tasks * args.requests,
+    )
+    setup_logging(settings, stream=SlowStream(delay))
+    samples, elapsed = asyncio.run(run(logger, args.tasks, args.requests))
+    report("queue + JSON pipeline", samples, elapsed)
+
+    if args.sample_rate < 1.0:
+        setup_logging(replace(settings, log_info_sample_rate=args.sample_rate), stream=SlowStream(delay))
+        samples, elapsed = asyncio.run(run(logger, args.tasks, args.requests))
+        report(f"queue, {args.sample_rate:.0%} sampled", samples, elapsed)
+
+    stop_logging()
+
+
+if __name__ == "__main__":
+    main()
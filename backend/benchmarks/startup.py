@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Startup time benchmark
+
+Measures how long it takes to import the app and how long a freshly started
+uvicorn process takes to answer its first /healthz (liveness) and /readyz
+(readiness) requests.
+
+Usage (from backend/):
+    python benchmarks/startup.py --runs 5
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import server; "
+    "print(time.perf_counter() - t)"
+)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_import() -> float:
+    """Time `import server` in a fresh interpreter"""
+    output = subprocess.check_output(
+        [sys.executable, "-c", IMPORT_SNIPPET], cwd=BACKEND_DIR, env=os.environ.copy()
+    )
+    return float(output.decode().strip().splitlines()[-1])
+
+
+def wait_for(url: str, started: float, deadline: float) -> float:
+    """Poll url until it returns 200, returning seconds since started"""
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return time.perf_counter() - started
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.005)
+    return float("nan")
+
+
+def measure_first_requests(timeout: float) -> tuple:
+    """Start uvicorn and time the first successful liveness and readiness calls"""
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=os.environ.copy(),
+    )
+    try:
+        deadline = started + timeout
+        live = wait_for(f"http://127.0.0.1:{port}/healthz", started, deadline)
+        ready = wait_for(f"http://127.0.0.1:{port}/readyz", started, deadline)
+        return live, ready
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def summarize(name: str, samples: list) -> None:
+    samples = [s for s in samples if s == s]
+    if not samples:
+        print(f"{name:<28} no successful samples")
+        return
+    print(
+        f"{name:<28} median {statistics.median(samples) * 1000:8.1f} ms"
+        f"   min {min(samples) * 1000:8.1f} ms   max {max(samples) * 1000:8.1f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds to wait for each probe")
+    args = parser.parse_args()
+
+    imports, lives, readies = [], [], []
+    for _ in range(args.runs):
+        imports.append(measure_import())
+        live, ready = measure_first_requests(args.timeout)
+        lives.append(live)
+        readies.append(ready)
+
+    summarize("import server", imports)
+    summarize("first /healthz response", lives)
+    summarize("first /readyz 200", readies)
+
+
+if __name__ == "__main__":
+    main()
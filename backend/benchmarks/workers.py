@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Worker count throughput benchmark
+
+Starts run.py once per worker count, drives it with keep-alive HTTP clients
+from separate processes and reports requests per second and latency.
+
+Usage (from backend/):
+    python benchmarks/workers.py --workers 1 2 4 --path /api/ --duration 10
+"""
+
+import argparse
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_live(port: int, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/healthz", timeout=1):
+                return
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.05)
+    raise RuntimeError(f"server on port {port} did not become live")
+
+
+def client(port: int, path: str, duration: float) -> list:
+    """Issue sequential keep-alive requests for duration seconds, returning latencies"""
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    latencies = []
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        connection.request("GET", path)
+        response = connection.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - started)
+    connection.close()
+    return latencies
+
+
+def run_load(port: int, path: str, clients: int, duration: float) -> list:
+    with ProcessPoolExecutor(max_workers=clients) as pool:
+        futures = [pool.submit(client, port, path, duration) for _ in range(clients)]
+        latencies = []
+        for future in futures:
+            latencies.extend(future.result())
+    return latencies
+
+
+def benchmark(workers: int, args) -> None:
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "run.py", "--workers", str(workers), "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=os.environ.copy(),
+    )
+    try:
+        wait_until_live(port, args.startup_timeout)
+        run_load(port, args.path, args.clients, 1.0)  # warm every worker
+        latencies = run_load(port, args.path, args.clients, args.duration)
+    finally:
+        process.terminate()
+        process.wait()
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1] if latencies else float("nan")
+    print(
+        f"workers={workers:<3} {len(latencies) / args.duration:10.1f} req/s"
+        f"   p50 {statistics.median(latencies) * 1000:7.2f} ms   p99 {p99 * 1000:7.2f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--path", default="/api/")
+    parser.add_argument("--clients", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--startup-timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    print(f"GET {args.path} with {args.clients} keep-alive clients for {args.duration:.0f}s each")
+    for workers in args.workers:
+        benchmark(workers, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+from config import get_settings
+from tenancy import current_tenant
+
+
+class ItemCache:
+    """Bounded LRU cache of single documents with a time-to-live.
+
+    Each worker process has its own cache and invalidations are local, so
+    another worker may serve a changed document for up to `ttl` seconds.
+    Entries are keyed by the current tenant as well.
+    """
+
+    def __init__(self, max_items: int, ttl: float):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._items: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+    def get(self, namespace: str, key: Hashable) -> Optional[dict]:
+        item_key = (current_tenant(), namespace, key)
+        entry = self._items.get(item_key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._items[item_key]
+            return None
+        self._items.move_to_end(item_key)
+        return dict(value)
+
+    def set(self, namespace: str, key: Hashable, value: dict) -> None:
+        if self.max_items <= 0:
+            return
+        item_key = (current_tenant(), namespace, key)
+        self._items[item_key] = (time.monotonic() + self.ttl, dict(value))
+        self._items.move_to_end(item_key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def invalidate(self, namespace: str, key: Hashable) -> None:
+        self._items.pop((current_tenant(), namespace, key), None)
+
+    def clear(self) -> None:
+        self._items.clear()
+
+
+_settings = get_settings()
+item_cache = ItemCache(_settings.item_cache_size, _settings.item_cache_ttl)
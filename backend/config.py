@@ -0,0 +1,191 @@
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from dotenv import load_dotenv
+
+ROOT_DIR = Path(__file__).parent
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+def _env_limits(name: str, default: str) -> Tuple[int, int, float]:
+    """Parse "limit,max_queue,queue_timeout" (see backpressure.py)"""
+    limit, max_queue, timeout = os.environ.get(name, default).split(',')
+    return int(limit), int(max_queue), float(timeout)
+
+
+def _env_tenants(name: str) -> Dict[str, List[str]]:
+    """Parse "tenant:host|host,tenant" into tenant -> hosts (see tenancy.py)"""
+    tenants = {}
+    for entry in os.environ.get(name, '').split(','):
+        tenant, _, hosts = entry.strip().partition(':')
+        if tenant:
+            tenants[tenant.lower()] = [host.strip().lower() for host in hosts.split('|') if host.strip()]
+    return tenants
+
+
+@dataclass(frozen=True)
+class Settings:
+    mongo_url: str
+    db_name: str
+    cors_origins: List[str]
+    # Storage backend (see repositories.py)
+    storage_backend: str
+    sqlite_path: str
+    storage_read_only: bool
+    # Deadline per storage call and circuit breaker (see resilience.py)
+    storage_call_timeout: float
+    storage_breaker_threshold: int
+    storage_breaker_reset: float
+    # Last good public read responses kept for serving stale (0 disables)
+    stale_cache_size: int
+    # Concurrency limit, queue size and queue wait deadline per route class
+    # (see backpressure.py; a limit of 0 disables the class)
+    backpressure_public_read: Tuple[int, int, float]
+    backpressure_public_write: Tuple[int, int, float]
+    backpressure_admin: Tuple[int, int, float]
+    # Fraction of each class's limit and queue one tenant may take
+    backpressure_tenant_share: float
+    # Multi-tenant mode (see tenancy.py): off, host or path
+    tenant_mode: str
+    tenants: Dict[str, List[str]]
+    default_tenant: str
+    tenant_path_prefix: str
+    # Mongo client tuning
+    mongo_server_selection_timeout_ms: int
+    mongo_max_pool_size: int
+    # Startup
+    warmup_on_startup: bool
+    warmup_timeout: float
+    # Portfolio media
+    media_dir: str
+    media_url_prefix: str
+    media_widths: List[int]
+    media_formats: List[str]
+    media_max_upload_bytes: int
+    media_workers: int
+    # Static snapshots of public content (empty snapshot_dir disables)
+    snapshot_dir: str
+    snapshot_url_prefix: str
+    snapshot_debounce: float
+    snapshot_retention: float
+    # Per-id document cache (0 items disables)
+    item_cache_size: int
+    item_cache_ttl: float
+    # Seconds between live counter reconciliations (0 disables)
+    counter_reconcile_interval: float
+    # Background document migrations (see migrations.py)
+    migrations_on_startup: bool
+    migration_batch_size: int
+    migration_ops_per_second: float
+    migration_poll_interval: float
+    # Server process (see run.py)
+    host: str
+    port: int
+    workers: int
+    timeout_keep_alive: int
+    backlog: int
+    timeout_graceful_shutdown: int
+    # Logging
+    log_level: str
+    log_format: str
+    log_info_sample_rate: float
+    log_queue_size: int
+    # Tracing
+    trace_exporter: str
+    trace_file: str
+    trace_otlp_endpoint: str
+    trace_sample_rate: float
+    trace_service_name: str
+    # On-demand profiling
+    profile_token: str
+    profile_sample_rate: float
+    profile_interval_ms: float
+    profile_dir: str
+    profile_max_bytes: int
+
+
+@lru_cache()
+def get_settings() -> Settings:
+    """Load settings from the environment (and backend/.env) exactly once"""
+    load_dotenv(ROOT_DIR / '.env')
+    return Settings(
+        # Only the mongo storage backend needs these
+        mongo_url=os.environ.get('MONGO_URL', ''),
+        db_name=os.environ.get('DB_NAME', ''),
+        cors_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
+        storage_backend=os.environ.get('STORAGE_BACKEND', 'mongo').lower(),
+        sqlite_path=os.environ.get('SQLITE_PATH', str(ROOT_DIR / 'content.db')),
+        storage_read_only=_env_bool('STORAGE_READ_ONLY', False),
+        storage_call_timeout=_env_float('STORAGE_CALL_TIMEOUT', 2.0),
+        storage_breaker_threshold=_env_int('STORAGE_BREAKER_THRESHOLD', 5),
+        storage_breaker_reset=_env_float('STORAGE_BREAKER_RESET', 10.0),
+        stale_cache_size=_env_int('STALE_CACHE_SIZE', 256),
+        backpressure_public_read=_env_limits('BACKPRESSURE_PUBLIC_READ', '64,256,1.0'),
+        backpressure_public_write=_env_limits('BACKPRESSURE_PUBLIC_WRITE', '16,64,5.0'),
+        backpressure_admin=_env_limits('BACKPRESSURE_ADMIN', '8,32,10.0'),
+        backpressure_tenant_share=_env_float('BACKPRESSURE_TENANT_SHARE', 0.25),
+        tenant_mode=os.environ.get('TENANT_MODE', 'off').lower(),
+        tenants=_env_tenants('TENANTS'),
+        default_tenant=os.environ.get('DEFAULT_TENANT', 'default').lower(),
+        tenant_path_prefix=os.environ.get('TENANT_PATH_PREFIX', '/t').rstrip('/'),
+        mongo_server_selection_timeout_ms=_env_int('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000),
+        mongo_max_pool_size=_env_int('MONGO_MAX_POOL_SIZE', 100),
+        warmup_on_startup=_env_bool('WARMUP_ON_STARTUP', True),
+        warmup_timeout=_env_float('WARMUP_TIMEOUT', 30.0),
+        media_dir=os.environ.get('MEDIA_DIR', str(ROOT_DIR / 'media')),
+        media_url_prefix=os.environ.get('MEDIA_URL_PREFIX', '/media'),
+        media_widths=[int(w) for w in os.environ.get('MEDIA_WIDTHS', '320,640,1280').split(',')],
+        media_formats=os.environ.get('MEDIA_FORMATS', 'avif,webp,jpeg').lower().split(','),
+        media_max_upload_bytes=_env_int('MEDIA_MAX_UPLOAD_BYTES', 10 * 1024 * 1024),
+        media_workers=_env_int('MEDIA_WORKERS', 2),
+        snapshot_dir=os.environ.get('SNAPSHOT_DIR', ''),
+        snapshot_url_prefix=os.environ.get('SNAPSHOT_URL_PREFIX', '/snapshots'),
+        snapshot_debounce=_env_float('SNAPSHOT_DEBOUNCE', 1.0),
+        snapshot_retention=_env_float('SNAPSHOT_RETENTION', 3600.0),
+        item_cache_size=_env_int('ITEM_CACHE_SIZE', 10000),
+        item_cache_ttl=_env_float('ITEM_CACHE_TTL', 60.0),
+        counter_reconcile_interval=_env_float('COUNTER_RECONCILE_INTERVAL', 300.0),
+        migrations_on_startup=_env_bool('MIGRATIONS_ON_STARTUP', True),
+        migration_batch_size=_env_int('MIGRATION_BATCH_SIZE', 500),
+        migration_ops_per_second=_env_float('MIGRATION_OPS_PER_SECOND', 1000.0),
+        migration_poll_interval=_env_float('MIGRATION_POLL_INTERVAL', 30.0),
+        host=os.environ.get('HOST', '0.0.0.0'),
+        port=_env_int('PORT', 8001),
+        workers=_env_int('WEB_CONCURRENCY', 0),
+        timeout_keep_alive=_env_int('TIMEOUT_KEEP_ALIVE', 5),
+        backlog=_env_int('BACKLOG', 2048),
+        timeout_graceful_shutdown=_env_int('TIMEOUT_GRACEFUL_SHUTDOWN', 30),
+        log_level=os.environ.get('LOG_LEVEL', 'INFO').upper(),
+        log_format=os.environ.get('LOG_FORMAT', 'json').lower(),
+        log_info_sample_rate=_env_float('LOG_INFO_SAMPLE_RATE', 1.0),
+        log_queue_size=_env_int('LOG_QUEUE_SIZE', 10000),
+        trace_exporter=os.environ.get('TRACE_EXPORTER', 'none').lower(),
+        trace_file=os.environ.get('TRACE_FILE', str(ROOT_DIR / 'traces.jsonl')),
+        trace_otlp_endpoint=os.environ.get('TRACE_OTLP_ENDPOINT', 'http://localhost:4318'),
+        trace_sample_rate=_env_float('TRACE_SAMPLE_RATE', 0.1),
+        trace_service_name=os.environ.get('TRACE_SERVICE_NAME', 'contentcraft-api'),
+        profile_token=os.environ.get('PROFILE_TOKEN', ''),
+        profile_sample_rate=_env_float('PROFILE_SAMPLE_RATE', 0.0),
+        profile_interval_ms=_env_float('PROFILE_INTERVAL_MS', 1.0),
+        profile_dir=os.environ.get('PROFILE_DIR', str(ROOT_DIR / 'profiles')),
+        profile_max_bytes=_env_int('PROFILE_MAX_BYTES', 50 * 1024 * 1024),
+    )
@@ -0,0 +1,143 @@
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+import snapshots
+import tenancy
+from models import StatsMetric, InquiryStatus
+from repositories import get_storage
+
+logger = logging.getLogger(__name__)
+
+# Raw counters kept next to the stats entries (see StatsRepository)
+ACTIVE_PORTFOLIO_ITEMS = "active_portfolio_items"
+ACTIVE_TESTIMONIALS = "active_testimonials"
+TESTIMONIAL_RATING_SUM = "testimonial_rating_sum"
+TOTAL_INQUIRIES = "total_inquiries"
+COMPLETED_INQUIRIES = "completed_inquiries"
+
+# Raw counters each stats metric is computed from
+METRIC_COUNTERS = {
+    StatsMetric.ACTIVE_PORTFOLIO_ITEMS: (ACTIVE_PORTFOLIO_ITEMS,),
+    StatsMetric.ACTIVE_TESTIMONIALS: (ACTIVE_TESTIMONIALS,),
+    StatsMetric.AVERAGE_TESTIMONIAL_RATING: (TESTIMONIAL_RATING_SUM, ACTIVE_TESTIMONIALS),
+    StatsMetric.TOTAL_INQUIRIES: (TOTAL_INQUIRIES,),
+    StatsMetric.COMPLETED_INQUIRIES: (COMPLETED_INQUIRIES,),
+}
+
+
+def _format_metric(metric: StatsMetric, values: Dict[str, float]) -> str:
+    if metric == StatsMetric.AVERAGE_TESTIMONIAL_RATING:
+        count = values.get(ACTIVE_TESTIMONIALS, 0)
+        average = values.get(TESTIMONIAL_RATING_SUM, 0) / count if count else 0
+        return f"{average:.1f}"
+    return f"{int(values.get(METRIC_COUNTERS[metric][0], 0)):,}"
+
+
+# Deltas implied by a document changing from `before` to `after` (None = absent)
+def portfolio_deltas(before: Optional[dict], after: Optional[dict]) -> Counter:
+    deltas = Counter()
+    deltas[ACTIVE_PORTFOLIO_ITEMS] = (
+        int(bool(after and after.get("is_active")))
+        - int(bool(before and before.get("is_active")))
+    )
+    return deltas
+
+
+def testimonial_deltas(before: Optional[dict], after: Optional[dict]) -> Counter:
+    deltas = Counter()
+    for doc, sign in ((before, -1), (after, 1)):
+        if doc and doc.get("is_active"):
+            deltas[ACTIVE_TESTIMONIALS] += sign
+            deltas[TESTIMONIAL_RATING_SUM] += sign * doc.get("rating", 0)
+    return deltas
+
+
+def inquiry_deltas(before: Optional[dict], after: Optional[dict]) -> Counter:
+    deltas = Counter()
+    deltas[TOTAL_INQUIRIES] = int(after is not None) - int(before is not None)
+    deltas[COMPLETED_INQUIRIES] = (
+        int(bool(after and after.get("status") == InquiryStatus.COMPLETED.value))
+        - int(bool(before and before.get("status") == InquiryStatus.COMPLETED.value))
+    )
+    return deltas
+
+
+async def apply(deltas: Counter) -> None:
+    """Atomically apply counter deltas and refresh the stats bound to them.
+
+    Called after a write has committed. Failures are logged rather than
+    raised: the write itself succeeded and the reconciliation job will
+    correct any drift.
+    """
+    changed = {name: delta for name, delta in deltas.items() if delta}
+    if not changed:
+        return
+    try:
+        stats = get_storage().stats
+        values = {}
+        for name, delta in changed.items():
+            values[name] = await stats.increment_counter(name, delta)
+        metrics = [m for m, names in METRIC_COUNTERS.items() if set(names) & set(changed)]
+        await refresh_stats(metrics, values)
+    except Exception as e:
+        logger.warning("Could not update live counters %s: %s", changed, e)
+
+
+async def refresh_stats(metrics: Iterable[StatsMetric], values: Optional[Dict[str, float]] = None) -> None:
+    """Rewrite `number` on every stats entry bound to one of metrics"""
+    metrics = list(metrics)
+    if not metrics:
+        return
+    stats = get_storage().stats
+    values = dict(values or {})
+    needed = {name for metric in metrics for name in METRIC_COUNTERS[metric]} - set(values)
+    if needed:
+        values.update(await stats.get_counters(needed))
+
+    now = datetime.utcnow()
+    for metric in metrics:
+        await stats.set_metric_number(metric.value, _format_metric(metric, values), now)
+    snapshots.schedule_publish()
+
+
+async def recount_inquiries() -> None:
+    """Recount the inquiry counters after a bulk update whose per-document changes are unknown"""
+    inquiries = get_storage().inquiries
+    values = {
+        TOTAL_INQUIRIES: await inquiries.count(),
+        COMPLETED_INQUIRIES: await inquiries.count(InquiryStatus.COMPLETED.value),
+    }
+    await get_storage().stats.set_counters(values)
+    await refresh_stats([StatsMetric.TOTAL_INQUIRIES, StatsMetric.COMPLETED_INQUIRIES], values)
+
+
+async def reconcile() -> None:
+    """Recompute every counter from the source collections and republish stats"""
+    storage = get_storage()
+    testimonial_count, rating_sum = await storage.testimonials.rating_summary()
+    values = {
+        ACTIVE_PORTFOLIO_ITEMS: await storage.portfolio.count_active(),
+        ACTIVE_TESTIMONIALS: testimonial_count,
+        TESTIMONIAL_RATING_SUM: rating_sum,
+        TOTAL_INQUIRIES: await storage.inquiries.count(),
+        COMPLETED_INQUIRIES: await storage.inquiries.count(InquiryStatus.COMPLETED.value),
+    }
+    await storage.stats.set_counters(values)
+    await refresh_stats(list(StatsMetric), values)
+
+
+async def reconcile_periodically(interval: float) -> None:
+    """Run reconcile() for every tenant every interval seconds until cancelled"""
+    while True:
+        for tenant in tenancy.tenants():
+            with tenancy.use(tenant):
+                try:
+                    await reconcile()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning("Counter reconciliation failed for %s: %s", tenant, e)
+        await asyncio.sleep(interval)
@@ -0,0 +1,74 @@
+import logging
+from typing import Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+
+from config import get_settings
+from tracing import mongo_event_listeners
+
+logger = logging.getLogger(__name__)
+
+# Listing order of portfolio items: pinned first, then by manual rank
+PORTFOLIO_ORDER = [("pinned", -1), ("rank", 1)]
+
+# The client is created by the application lifespan (see server.py), never at
+# import time, so importing the app is cheap and does not touch the network.
+_client: Optional[AsyncIOMotorClient] = None
+
+
+def connect() -> AsyncIOMotorClient:
+    """Create the shared Mongo client if it does not exist yet"""
+    global _client
+    if _client is None:
+        settings = get_settings()
+        if not settings.mongo_url or not settings.db_name:
+            raise RuntimeError("MONGO_URL and DB_NAME must be set for the mongo storage backend")
+        _client = AsyncIOMotorClient(
+            settings.mongo_url,
+            serverSelectionTimeoutMS=settings.mongo_server_selection_timeout_ms,
+            maxPoolSize=settings.mongo_max_pool_size,
+            event_listeners=mongo_event_listeners(settings),
+        )
+    return _client
+
+
+def close() -> None:
+    """Close the shared Mongo client"""
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+
+
+def get_db() -> AsyncIOMotorDatabase:
+    """Return the application database, connecting lazily if needed"""
+    return connect()[get_settings().db_name]
+
+
+async def ensure_indexes() -> None:
+    """Create the indexes backing the public and admin queries"""
+    db = get_db()
+    # Every query is restricted to one tenant (see tenancy.py), so every
+    # index leads with tenant_id.
+    # Listing order is (pinned desc, rank asc) with and without a type filter;
+    # (pinned, rank) serves the neighbour lookups of position updates
+    await db.portfolio_items.create_index([
+        ("tenant_id", 1), ("is_active", 1), ("type", 1), ("pinned", -1), ("rank", 1),
+    ])
+    await db.portfolio_items.create_index([("tenant_id", 1), ("is_active", 1), ("pinned", -1), ("rank", 1)])
+    await db.portfolio_items.create_index([("tenant_id", 1), ("pinned", -1), ("rank", 1)])
+    await db.testimonials.create_index([("tenant_id", 1), ("is_active", 1), ("created_at", -1)])
+    # sort=subscribers orders by (subscriber_count, created_at) in one
+    # direction, which these indexes serve walked forwards or backwards
+    await db.testimonials.create_index([
+        ("tenant_id", 1), ("is_active", 1), ("subscriber_count", -1), ("created_at", -1),
+    ])
+    await db.stats.create_index([("tenant_id", 1), ("order", 1)])
+    await db.stats.create_index([("tenant_id", 1), ("metric", 1)])
+    await db.contact_inquiries.create_index([("tenant_id", 1), ("status", 1), ("created_at", -1)])
+    await db.contact_inquiries.create_index([("tenant_id", 1), ("created_at", -1)])
+    await db.contact_inquiries.create_index([
+        ("tenant_id", 1), ("status", 1), ("subscriber_count", -1), ("created_at", -1),
+    ])
+    await db.contact_inquiries.create_index([("tenant_id", 1), ("subscriber_count", -1), ("created_at", -1)])
+    await db.status_checks.create_index([("tenant_id", 1)])
@@ -0,0 +1,35 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+import backpressure
+import repositories
+
+router = APIRouter()
+
+
+@router.get("/healthz")
+async def liveness():
+    """Liveness probe: the process is up and serving requests"""
+    return {"status": "ok"}
+
+
+@router.get("/readyz")
+async def readiness():
+    """Readiness probe: storage answers a ping and warm-up has finished"""
+    storage_ok = await repositories.ping()
+    warm = repositories.is_warm()
+    ready = storage_ok and warm
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "not ready",
+            "storage": storage_ok,
+            "warmup_complete": warm,
+        },
+    )
+
+
+@router.get("/metrics/backpressure")
+async def backpressure_metrics():
+    """Concurrency, queue depth and queue wait histogram per route class (this worker)"""
+    return backpressure.metrics()
@@ -0,0 +1,148 @@
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from starlette.staticfiles import StaticFiles
+
+from config import Settings
+from files import atomic_write
+
+logger = logging.getLogger(__name__)
+
+_EXTENSIONS = {"avif": "avif", "webp": "webp", "jpeg": "jpg"}
+# Refuse decompression bombs well before they exhaust a worker's memory
+_MAX_PIXELS = 40_000_000
+
+_pool: Optional[ProcessPoolExecutor] = None
+# Uploads of the same content that are being processed right now
+_in_flight: Dict[str, asyncio.Future] = {}
+
+
+def _render_variants(data: bytes, digest: str, directory: str, widths: List[int], formats: List[str]) -> dict:
+    """Decode, resize and encode every variant of one image (runs in a worker process)"""
+    from PIL import Image, ImageOps
+
+    # Pillow only raises above twice this limit (and warns below it), so the
+    # size from the header is checked here before anything is decoded
+    Image.MAX_IMAGE_PIXELS = _MAX_PIXELS
+    Image.init()
+    try:
+        image = Image.open(io.BytesIO(data))
+    except Exception as e:
+        raise ValueError("Not a supported image") from e
+    if image.width * image.height > _MAX_PIXELS:
+        raise ValueError(f"Image is larger than {_MAX_PIXELS:,} pixels")
+    try:
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    except Exception as e:
+        raise ValueError("Not a supported image") from e
+
+    has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    image = image.convert("RGBA" if has_alpha else "RGB")
+    width, height = image.size
+    # Never upscale; the original width stands in for any larger target
+    targets = sorted({min(w, width) for w in widths})
+
+    target_dir = Path(directory) / digest[:2]
+    target_dir.mkdir(parents=True, exist_ok=True)
+    variants = []
+    for target_width in targets:
+        target_height = max(1, round(height * target_width / width))
+        resized = image if target_width == width else image.resize((target_width, target_height), Image.LANCZOS)
+        for fmt in formats:
+            if fmt.upper() not in Image.SAVE:
+                continue
+            frame = resized.convert("RGB") if fmt == "jpeg" and has_alpha else resized
+            buffer = io.BytesIO()
+            frame.save(buffer, format=fmt.upper(), quality=80, optimize=True)
+            name = f"{digest}-{target_width}.{_EXTENSIONS[fmt]}"
+            atomic_write(target_dir / name, buffer.getvalue())
+            variants.append({
+                "path": f"{digest[:2]}/{name}",
+                "width": target_width,
+                "height": target_height,
+                "format": fmt,
+            })
+
+    manifest = {"hash": digest, "width": width, "height": height, "variants": variants}
+    # Written last: its presence means every variant is on disk
+    atomic_write(target_dir / f"{digest}.json", json.dumps(manifest).encode())
+    return manifest
+
+
+def _read_manifest(directory: str, digest: str) -> Optional[dict]:
+    path = Path(directory) / digest[:2] / f"{digest}.json"
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def _get_pool(settings: Settings) -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # Every server worker has its own pool, so keep it small (see run.py).
+        # Forking a worker whose logging, SQLite and span export threads may
+        # hold locks can deadlock the child, so start from a clean process.
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.media_workers or None,
+            mp_context=multiprocessing.get_context(method),
+        )
+    return _pool
+
+
+async def process_image(data: bytes, settings: Settings) -> dict:
+    """Return the variant manifest for an uploaded image, rendering it only once per content hash"""
+    digest = hashlib.sha256(data).hexdigest()
+    loop = asyncio.get_running_loop()
+
+    manifest = await loop.run_in_executor(None, _read_manifest, settings.media_dir, digest)
+    if manifest is not None:
+        return manifest
+
+    if digest in _in_flight:
+        return await asyncio.shield(_in_flight[digest])
+
+    future = loop.run_in_executor(
+        _get_pool(settings),
+        _render_variants,
+        data,
+        digest,
+        settings.media_dir,
+        settings.media_widths,
+        settings.media_formats,
+    )
+    _in_flight[digest] = future
+    try:
+        return await asyncio.shield(future)
+    finally:
+        _in_flight.pop(digest, None)
+
+
+def variant_url(settings: Settings, path: str) -> str:
+    return f"{settings.media_url_prefix}/{path}"
+
+
+def shutdown() -> None:
+    """Stop the worker processes"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """Static files whose names are content hashes, so they can be cached forever"""
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
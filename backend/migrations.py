@@ -0,0 +1,323 @@
+"""
+Online, throttled migrations of stored documents
+
+Each migration upgrades the documents of one collection that still match its
+`filter`. The runner walks the collection in `_id` order, writes each batch
+with one `bulk_write` and sleeps as needed to stay under
+MIGRATION_OPS_PER_SECOND, so it can run against a live database. Progress
+(the last `_id` written) is kept in the `migrations` collection under a
+lease, so a restarted or different worker resumes where the last one
+stopped and only one worker runs a migration at a time. Migrations run in
+version order; workers wait for one leased elsewhere before the next.
+
+Until a migration has completed, documents read by the API are passed
+through `upcast()`, which applies the same upgrade in memory. Responses are
+therefore in the new shape from the moment the code is deployed. Every
+worker polls for completed migrations every MIGRATION_POLL_INTERVAL seconds.
+
+Run pending migrations by hand with `python migrations.py` (add `--status`
+to only print progress).
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Set
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from config import get_settings
+from database import get_db
+from models import parse_subscriber_count
+from ranking import rank_from_timestamp
+
+logger = logging.getLogger(__name__)
+
+# A worker that stops renewing its lease for this long is presumed dead
+LEASE_SECONDS = 60
+
+_owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+# Versions known to be complete; upcast() skips them
+_completed: Set[int] = set()
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    collection: str
+    # Mongo filter matching documents that still need the upgrade
+    filter: dict
+    # The same condition evaluated on a document in memory
+    needs: Callable[[dict], bool]
+    # Fields to $set on a document that needs the upgrade
+    upgrade: Callable[[dict], dict]
+
+
+def _portfolio_rank(doc: dict) -> dict:
+    created_at = doc.get("created_at") or datetime.utcnow()
+    return {"rank": rank_from_timestamp(created_at, doc["_id"]), "pinned": bool(doc.get("pinned"))}
+
+
+def _subscriber_count(doc: dict) -> dict:
+    return {"subscriber_count": parse_subscriber_count(doc.get("subscribers"))}
+
+
+def _tenant_id(doc: dict) -> dict:
+    return {"tenant_id": get_settings().default_tenant}
+
+
+# Collections whose documents belong to a tenant (see tenancy.py)
+TENANT_COLLECTIONS = ("portfolio_items", "testimonials", "stats", "contact_inquiries", "status_checks")
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(
+        version=1,
+        name="portfolio_items: timestamp-derived rank",
+        collection="portfolio_items",
+        filter={"rank": {"$exists": False}},
+        needs=lambda doc: "rank" not in doc,
+        upgrade=_portfolio_rank,
+    ),
+    Migration(
+        version=2,
+        name="testimonials: numeric subscriber_count",
+        collection="testimonials",
+        filter={"subscriber_count": {"$exists": False}},
+        needs=lambda doc: "subscriber_count" not in doc,
+        upgrade=_subscriber_count,
+    ),
+    Migration(
+        version=3,
+        name="contact_inquiries: numeric subscriber_count",
+        collection="contact_inquiries",
+        filter={"subscriber_count": {"$exists": False}},
+        needs=lambda doc: "subscriber_count" not in doc,
+        upgrade=_subscriber_count,
+    ),
+] + [
+    # Documents written before multi-tenant mode belong to the default tenant
+    Migration(
+        version=4 + i,
+        name=f"{collection}: tenant_id",
+        collection=collection,
+        filter={"tenant_id": {"$exists": False}},
+        needs=lambda doc: "tenant_id" not in doc,
+        upgrade=_tenant_id,
+    )
+    for i, collection in enumerate(TENANT_COLLECTIONS)
+]
+
+_by_collection: Dict[str, List[Migration]] = {}
+for _migration in MIGRATIONS:
+    _by_collection.setdefault(_migration.collection, []).append(_migration)
+_tenant_backfill: Dict[str, int] = {
+    m.collection: m.version for m in MIGRATIONS if m.upgrade is _tenant_id
+}
+
+
+def upcast(collection: str, doc: Optional[dict]) -> Optional[dict]:
+    """Bring a document read from collection up to date in memory"""
+    if doc is None:
+        return doc
+    for migration in _by_collection.get(collection, ()):
+        if migration.version not in _completed and migration.needs(doc):
+            doc.update(migration.upgrade(doc))
+    return doc
+
+
+def tenant_backfilled(collection: str) -> bool:
+    """Whether every document of collection is known to have a stored tenant_id"""
+    return _tenant_backfill[collection] in _completed
+
+
+class Throttle:
+    """Sleep just enough to keep the average rate at or below ops_per_second"""
+
+    def __init__(self, ops_per_second: float):
+        self.ops_per_second = ops_per_second
+        self.started = time.monotonic()
+        self.ops = 0
+
+    async def wait(self, ops: int) -> None:
+        self.ops += ops
+        if self.ops_per_second <= 0:
+            return
+        ahead = self.ops / self.ops_per_second - (time.monotonic() - self.started)
+        if ahead > 0:
+            await asyncio.sleep(ahead)
+
+
+async def load_completed() -> Set[int]:
+    """Refresh the set of completed versions from the migrations collection"""
+    async for record in get_db().migrations.find({"state": "complete"}, {"_id": 1}):
+        _completed.add(record["_id"])
+    return _completed
+
+
+async def _claim(migration: Migration) -> Optional[dict]:
+    """Take (or renew) the lease on a migration; None if another worker holds it or it is done"""
+    migrations = get_db().migrations
+    now = datetime.utcnow()
+    try:
+        await migrations.update_one(
+            {"_id": migration.version},
+            {"$setOnInsert": {
+                "name": migration.name,
+                "collection": migration.collection,
+                "state": "pending",
+                "last_id": None,
+                "processed": 0,
+                "modified": 0,
+                "created_at": now,
+            }},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        # Another worker inserted the record at the same moment
+        pass
+    return await migrations.find_one_and_update(
+        {
+            "_id": migration.version,
+            "state": {"$ne": "complete"},
+            "$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}, {"owner": _owner}],
+        },
+        {"$set": {
+            "state": "running",
+            "owner": _owner,
+            "lease_until": now + timedelta(seconds=LEASE_SECONDS),
+            "updated_at": now,
+        }},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def run(migration: Migration, batch_size: int, ops_per_second: float) -> bool:
+    """Run one migration to completion; False if another worker owns it"""
+    record = await _claim(migration)
+    if record is None:
+        return False
+    db = get_db()
+    collection = db[migration.collection]
+    last_id = record.get("last_id")
+    throttle = Throttle(ops_per_second)
+    logger.info("Running migration %s (%s) from _id %r", migration.version, migration.name, last_id)
+
+    while True:
+        query = dict(migration.filter)
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = await collection.find(query).sort("_id", 1).limit(batch_size).to_list(batch_size)
+
+        if not batch:
+            # Old code may have written outdated documents behind the cursor
+            if last_id is not None and await collection.find_one(migration.filter, {"_id": 1}):
+                last_id = None
+                continue
+            break
+
+        # Re-check the filter on write so documents updated meanwhile are left alone
+        result = await collection.bulk_write(
+            [UpdateOne({**migration.filter, "_id": doc["_id"]}, {"$set": migration.upgrade(doc)}) for doc in batch],
+            ordered=False,
+        )
+        last_id = batch[-1]["_id"]
+        now = datetime.utcnow()
+        renewed = await db.migrations.update_one(
+            {"_id": migration.version, "owner": _owner},
+            {
+                "$set": {"last_id": last_id, "lease_until": now + timedelta(seconds=LEASE_SECONDS), "updated_at": now},
+                "$inc": {"processed": len(batch), "modified": result.modified_count},
+            },
+        )
+        if not renewed.matched_count:
+            logger.warning("Lost the lease on migration %s; stopping", migration.version)
+            return False
+        await throttle.wait(len(batch))
+
+    now = datetime.utcnow()
+    await db.migrations.update_one(
+        {"_id": migration.version, "owner": _owner},
+        {"$set": {"state": "complete", "completed_at": now, "updated_at": now, "lease_until": None}},
+    )
+    _completed.add(migration.version)
+    logger.info("Migration %s completed", migration.version)
+    return True
+
+
+async def run_pending() -> None:
+    """Run every migration that has not completed yet, strictly in version order.
+
+    A migration leased by another worker is waited for rather than skipped,
+    since later migrations may depend on it.
+    """
+    settings = get_settings()
+    await load_completed()
+    for migration in MIGRATIONS:
+        while migration.version not in _completed:
+            try:
+                if await run(migration, settings.migration_batch_size, settings.migration_ops_per_second):
+                    break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Progress is saved per batch; the next run resumes from there
+                logger.error("Migration %s failed; later migrations wait for it: %s", migration.version, e)
+                return
+            await asyncio.sleep(settings.migration_poll_interval)
+            await load_completed()
+
+
+async def follow_completed() -> None:
+    """Keep polling for migrations completed by other workers until all are done.
+
+    Until a worker knows a migration has completed it keeps upcasting on
+    every read and keeps the pre-tenant query fallbacks.
+    """
+    settings = get_settings()
+    while True:
+        try:
+            await load_completed()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Could not load completed migrations: %s", e)
+        if all(m.version in _completed for m in MIGRATIONS):
+            return
+        await asyncio.sleep(settings.migration_poll_interval)
+
+
+async def status() -> List[dict]:
+    records = {r["_id"]: r async for r in get_db().migrations.find({})}
+    return [
+        {"version": m.version, "name": m.name, **{
+            k: records.get(m.version, {}).get(k) for k in ("state", "last_id", "processed", "modified", "completed_at")
+        }}
+        for m in MIGRATIONS
+    ]
+
+
+if __name__ == "__main__":
+    import sys
+
+    import database
+
+    async def main() -> None:
+        database.connect()
+        try:
+            if "--status" not in sys.argv:
+                await run_pending()
+            for row in await status():
+                print(row)
+        finally:
+            database.close()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
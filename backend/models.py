@@ -1,10 +1,39 @@
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, Field, EmailStr, field_validator, model_validator
 from typing import List, Optional
 from enum import Enum
-from datetime import datetime
+from datetime import datetime, timezone
+import re
 import uuid
 
 
+# A number with an optional multiplier, then optionally "+", a range
+# ("10k-50k" counts as its lower bound) or "subscribers"; anything else is
+# unknown rather than silently dropped
+_SUBSCRIBER_PATTERN = re.compile(
+    r"\s*(\d[\d,]*(?:\.\d+)?)\s*(thousand|million|billion|mill|mil|bn|k|m|b)?"
+    r"\s*\+?\s*(?:(?:-|–|to)\s*\S.*|subs|subscribers)?\s*",
+    re.IGNORECASE,
+)
+_SUBSCRIBER_MULTIPLIERS = {
+    "k": 1_000, "thousand": 1_000,
+    "m": 1_000_000, "mil": 1_000_000, "mill": 1_000_000, "million": 1_000_000,
+    "b": 1_000_000_000, "bn": 1_000_000_000, "billion": 1_000_000_000,
+}
+
+
+def parse_subscriber_count(value: Optional[str]) -> Optional[int]:
+    """Parse display strings like "500K", "1.2M+", "2 million" or "12,345" into
+    an integer; None when the value is missing or has an unknown suffix"""
+    if not value:
+        return None
+    match = _SUBSCRIBER_PATTERN.fullmatch(value)
+    if not match:
+        return None
+    number = float(match.group(1).replace(",", ""))
+    multiplier = _SUBSCRIBER_MULTIPLIERS.get((match.group(2) or "").lower(), 1)
+    return int(round(number * multiplier))
+
+
 class PortfolioType(str, Enum):
     VIDEO_SCRIPTS = "Video Scripts"
     CONTENT_PACKAGE = "Content Package"
@@ -14,6 +43,14 @@ class PortfolioType(str, Enum):
     THUMBNAIL_COPY = "Thumbnail Copy"
 
 
+class StatsMetric(str, Enum):
+    ACTIVE_PORTFOLIO_ITEMS = "active_portfolio_items"
+    ACTIVE_TESTIMONIALS = "active_testimonials"
+    AVERAGE_TESTIMONIAL_RATING = "average_testimonial_rating"
+    TOTAL_INQUIRIES = "total_inquiries"
+    COMPLETED_INQUIRIES = "completed_inquiries"
+
+
 class InquiryStatus(str, Enum):
     NEW = "new"
     CONTACTED = "contacted"
@@ -31,6 +68,8 @@ class PortfolioItemBase(BaseModel):
     results: str = Field(..., min_length=1, max_length=300)
     tags: List[str] = Field(default=[], max_items=10)
     is_active: bool = Field(default=True)
+    # Pinned items are listed before all others
+    pinned: bool = Field(default=False)
 
 
 class PortfolioItemCreate(PortfolioItemBase):
@@ -47,8 +86,35 @@ class PortfolioItemUpdate(BaseModel):
     is_active: Optional[bool] = None
 
 
+class PortfolioPositionUpdate(BaseModel):
+    """Move an item directly after `after_id` and/or before `before_id`.
+
+    With neither, the item moves to the top of its (pinned or unpinned) group.
+    """
+    after_id: Optional[str] = None
+    before_id: Optional[str] = None
+    pinned: Optional[bool] = None
+
+
+class ImageVariant(BaseModel):
+    url: str
+    width: int
+    height: int
+    format: str
+
+
+class PortfolioImage(BaseModel):
+    hash: str
+    width: int
+    height: int
+    variants: List[ImageVariant] = []
+
+
 class PortfolioItem(PortfolioItemBase):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    # Fractional rank key; see ranking.py
+    rank: Optional[str] = None
+    image: Optional[PortfolioImage] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -56,6 +122,12 @@ class PortfolioItem(PortfolioItemBase):
         from_attributes = True
 
 
+class PortfolioLookup(BaseModel):
+    """Batch lookup result: `items` follows the requested id order, with null for misses"""
+    items: List[Optional[PortfolioItem]]
+    missing: List[str]
+
+
 # Testimonial Models
 class TestimonialBase(BaseModel):
     name: str = Field(..., min_length=1, max_length=100)
@@ -81,18 +153,35 @@ class TestimonialUpdate(BaseModel):
 
 class Testimonial(TestimonialBase):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    # Parsed from `subscribers` on write; indexed for sorting and range filters
+    subscriber_count: Optional[int] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+    @model_validator(mode="after")
+    def fill_subscriber_count(self):
+        if self.subscriber_count is None:
+            self.subscriber_count = parse_subscriber_count(self.subscribers)
+        return self
+
     class Config:
         from_attributes = True
 
 
+class TestimonialLookup(BaseModel):
+    """Batch lookup result: `items` follows the requested id order, with null for misses"""
+    items: List[Optional[Testimonial]]
+    missing: List[str]
+
+
 # Stats Models
 class StatsBase(BaseModel):
     number: str = Field(..., min_length=1, max_length=20)
     label: str = Field(..., min_length=1, max_length=100)
     order: int = Field(..., ge=0)
+    # When set, `number` is kept in sync with a live counter (plus `suffix`)
+    metric: Optional[StatsMetric] = None
+    suffix: str = Field(default="", max_length=5)
 
 
 class StatsCreate(StatsBase):
@@ -103,6 +192,8 @@ class StatsUpdate(BaseModel):
     number: Optional[str] = Field(None, min_length=1, max_length=20)
     label: Optional[str] = Field(None, min_length=1, max_length=100)
     order: Optional[int] = Field(None, ge=0)
+    metric: Optional[StatsMetric] = None
+    suffix: Optional[str] = Field(None, max_length=5)
 
 
 class Stats(StatsBase):
@@ -133,11 +224,75 @@ class ContactInquiryUpdate(BaseModel):
     status: Optional[InquiryStatus] = None
 
 
+# Statuses an inquiry may move to from each status
+INQUIRY_TRANSITIONS = {
+    InquiryStatus.NEW: {InquiryStatus.CONTACTED, InquiryStatus.IN_PROGRESS, InquiryStatus.CLOSED},
+    InquiryStatus.CONTACTED: {InquiryStatus.IN_PROGRESS, InquiryStatus.COMPLETED, InquiryStatus.CLOSED},
+    InquiryStatus.IN_PROGRESS: {InquiryStatus.COMPLETED, InquiryStatus.CLOSED},
+    InquiryStatus.COMPLETED: {InquiryStatus.CLOSED},
+    # Reopening puts an inquiry back into triage
+    InquiryStatus.CLOSED: {InquiryStatus.NEW},
+}
+
+
+def inquiry_sources(target: InquiryStatus) -> List[InquiryStatus]:
+    """Statuses an inquiry may move to target from"""
+    return [status for status, targets in INQUIRY_TRANSITIONS.items() if target in targets]
+
+
+class ContactInquiryFilter(BaseModel):
+    status: Optional[InquiryStatus] = None
+    created_before: Optional[datetime] = None
+
+    @field_validator("created_before")
+    @classmethod
+    def to_naive_utc(cls, value):
+        # Stored timestamps are naive UTC
+        if value is not None and value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+    @model_validator(mode="after")
+    def check_not_empty(self):
+        # An empty filter would select every inquiry
+        if self.status is None and self.created_before is None:
+            raise ValueError("Filter by status or created_before")
+        return self
+
+
+class ContactInquiryBulkStatusUpdate(BaseModel):
+    status: InquiryStatus
+    ids: Optional[List[str]] = Field(None, min_length=1, max_length=1000)
+    filter: Optional[ContactInquiryFilter] = None
+
+    @model_validator(mode="after")
+    def check_selection(self):
+        if (self.ids is None) == (self.filter is None):
+            raise ValueError("Provide either ids or filter")
+        return self
+
+
+class ContactInquiryBulkStatusResult(BaseModel):
+    matched: int
+    modified: int
+    # Ids that exist but may not move to the requested status
+    skipped: List[str] = []
+    missing: List[str] = []
+
+
 class ContactInquiry(ContactInquiryBase):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     status: InquiryStatus = Field(default=InquiryStatus.NEW)
+    # Parsed from `subscribers` on write; indexed for audience-tier filters
+    subscriber_count: Optional[int] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+    @model_validator(mode="after")
+    def fill_subscriber_count(self):
+        if self.subscriber_count is None:
+            self.subscriber_count = parse_subscriber_count(self.subscribers)
+        return self
+
     class Config:
         from_attributes = True
\ No newline at end of file
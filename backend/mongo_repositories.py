@@ -0,0 +1,234 @@
+from typing import Dict, Iterable, Optional, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import ConnectionFailure, ExecutionTimeout
+
+import database
+import migrations
+from database import get_db, PORTFOLIO_ORDER
+from repositories import (
+    InquiryRepository, PortfolioRepository, StatsRepository, StatusCheckRepository,
+    Storage, TestimonialRepository, sort_fields,
+)
+from tenancy import current_tenant, default_tenant, scoped_key
+
+
+def _scoped(collection: str, query: Optional[dict] = None) -> dict:
+    """Restrict query to the current tenant"""
+    query = dict(query or {})
+    tenant = current_tenant()
+    if tenant == default_tenant() and not migrations.tenant_backfilled(collection):
+        # Documents from before multi-tenant mode have no tenant_id yet
+        query["tenant_id"] = {"$in": [tenant, None]}
+    else:
+        query["tenant_id"] = tenant
+    return query
+
+
+def _owned(document: dict) -> dict:
+    document["tenant_id"] = current_tenant()
+    return document
+
+
+def _subscriber_range(query: dict, min_subscribers: Optional[int], max_subscribers: Optional[int]) -> dict:
+    condition = {}
+    if min_subscribers is not None:
+        condition["$gte"] = min_subscribers
+    if max_subscribers is not None:
+        condition["$lte"] = max_subscribers
+    if condition:
+        query["subscriber_count"] = condition
+    return query
+
+
+class MongoPortfolioRepository(PortfolioRepository):
+    @property
+    def collection(self):
+        return get_db().portfolio_items
+
+    async def list(self, active_only, type_filter=None):
+        query = _scoped("portfolio_items")
+        if active_only:
+            query["is_active"] = True
+        if type_filter:
+            query["type"] = type_filter
+        return await self.collection.find(query).sort(PORTFOLIO_ORDER).to_list(1000)
+
+    async def get(self, item_id):
+        return await self.collection.find_one(_scoped("portfolio_items", {"_id": item_id}))
+
+    async def get_many(self, ids):
+        return await self.collection.find(_scoped("portfolio_items", {"_id": {"$in": list(ids)}})).to_list(None)
+
+    async def insert(self, document):
+        await self.collection.insert_one(_owned(document))
+        return document
+
+    async def update(self, item_id, fields):
+        return await self.collection.find_one_and_update(_scoped("portfolio_items", {"_id": item_id}), {"$set": fields})
+
+    async def delete(self, item_id):
+        return await self.collection.find_one_and_delete(_scoped("portfolio_items", {"_id": item_id}))
+
+    async def adjacent_rank(self, pinned, exclude_id=None, above=None, below=None):
+        query = _scoped("portfolio_items", {"pinned": True} if pinned else {"pinned": {"$ne": True}})
+        query["rank"] = {"$exists": True}
+        if exclude_id is not None:
+            query["_id"] = {"$ne": exclude_id}
+        direction = 1
+        if above is not None:
+            query["rank"] = {"$gt": above}
+        elif below is not None:
+            query["rank"] = {"$lt": below}
+            direction = -1
+        document = await self.collection.find_one(query, {"rank": 1}, sort=[("rank", direction)])
+        return document["rank"] if document else None
+
+    async def count_active(self):
+        return await self.collection.count_documents(_scoped("portfolio_items", {"is_active": True}))
+
+
+class MongoTestimonialRepository(TestimonialRepository):
+    @property
+    def collection(self):
+        return get_db().testimonials
+
+    async def list(self, active_only, min_subscribers=None, max_subscribers=None, sort="created_at", order="desc"):
+        query = _subscriber_range(_scoped("testimonials"), min_subscribers, max_subscribers)
+        if active_only:
+            query["is_active"] = True
+        return await self.collection.find(query).sort(sort_fields(sort, order)).to_list(1000)
+
+    async def get_many(self, ids):
+        return await self.collection.find(_scoped("testimonials", {"_id": {"$in": list(ids)}})).to_list(None)
+
+    async def insert(self, document):
+        await self.collection.insert_one(_owned(document))
+        return document
+
+    async def rating_summary(self) -> Tuple[int, float]:
+        rating = await self.collection.aggregate([
+            {"$match": _scoped("testimonials", {"is_active": True})},
+            {"$group": {"_id": None, "count": {"$sum": 1}, "sum": {"$sum": "$rating"}}},
+        ]).to_list(1)
+        return (rating[0]["count"], rating[0]["sum"]) if rating else (0, 0)
+
+
+class MongoStatsRepository(StatsRepository):
+    @property
+    def collection(self):
+        return get_db().stats
+
+    async def list(self):
+        return await self.collection.find(_scoped("stats")).sort("order", 1).to_list(1000)
+
+    async def get(self, stat_id):
+        return await self.collection.find_one(_scoped("stats", {"_id": stat_id}))
+
+    async def update(self, stat_id, fields):
+        return await self.collection.find_one_and_update(_scoped("stats", {"_id": stat_id}), {"$set": fields})
+
+    async def set_metric_number(self, metric, number, updated_at):
+        await self.collection.update_many(
+            _scoped("stats", {"metric": metric}),
+            [{"$set": {
+                "number": {"$concat": [number, {"$ifNull": ["$suffix", ""]}]},
+                "updated_at": updated_at,
+            }}],
+        )
+
+    async def increment_counter(self, name, delta):
+        counter = await get_db().counters.find_one_and_update(
+            {"_id": scoped_key(name)},
+            {"$inc": {"value": delta}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return counter["value"]
+
+    async def get_counters(self, names: Iterable[str]) -> Dict[str, float]:
+        keys = {scoped_key(name): name for name in names}
+        return {
+            keys[counter["_id"]]: counter["value"]
+            async for counter in get_db().counters.find({"_id": {"$in": list(keys)}})
+        }
+
+    async def set_counters(self, values):
+        for name, value in values.items():
+            await get_db().counters.update_one({"_id": scoped_key(name)}, {"$set": {"value": value}}, upsert=True)
+
+
+class MongoInquiryRepository(InquiryRepository):
+    @property
+    def collection(self):
+        return get_db().contact_inquiries
+
+    async def list(self, status=None, min_subscribers=None, max_subscribers=None,
+                   sort="created_at", order="desc", limit=50):
+        query = _subscriber_range(_scoped("contact_inquiries"), min_subscribers, max_subscribers)
+        if status:
+            query["status"] = status
+        return await self.collection.find(query).sort(sort_fields(sort, order)).limit(limit).to_list(limit)
+
+    async def insert(self, document):
+        await self.collection.insert_one(_owned(document))
+        return document
+
+    async def get(self, inquiry_id):
+        return await self.collection.find_one(_scoped("contact_inquiries", {"_id": inquiry_id}))
+
+    async def get_many(self, ids):
+        return await self.collection.find(_scoped("contact_inquiries", {"_id": {"$in": list(ids)}})).to_list(None)
+
+    async def update(self, inquiry_id, fields, statuses=None):
+        query = _scoped("contact_inquiries", {"_id": inquiry_id})
+        if statuses is not None:
+            query["status"] = {"$in": list(statuses)}
+        return await self.collection.find_one_and_update(query, {"$set": fields})
+
+    async def update_many(self, fields, ids=None, statuses=None, created_before=None):
+        query = _scoped("contact_inquiries")
+        if ids is not None:
+            query["_id"] = {"$in": list(ids)}
+        if statuses is not None:
+            query["status"] = {"$in": list(statuses)}
+        if created_before is not None:
+            query["created_at"] = {"$lt": created_before}
+        result = await self.collection.update_many(query, {"$set": fields})
+        return result.matched_count, result.modified_count
+
+    async def count(self, status=None):
+        return await self.collection.count_documents(_scoped("contact_inquiries", {"status": status} if status else {}))
+
+
+class MongoStatusCheckRepository(StatusCheckRepository):
+    async def list(self, limit=1000):
+        return await get_db().status_checks.find(_scoped("status_checks")).to_list(limit)
+
+    async def insert(self, document):
+        await get_db().status_checks.insert_one(_owned(document))
+        return document
+
+
+class MongoStorage(Storage):
+    name = "mongo"
+    # Includes failover errors (AutoReconnect, NotPrimaryError) and server selection timeouts
+    transient_errors = (ConnectionFailure, ExecutionTimeout)
+
+    def __init__(self):
+        database.connect()
+        self.portfolio = MongoPortfolioRepository()
+        self.testimonials = MongoTestimonialRepository()
+        self.stats = MongoStatsRepository()
+        self.inquiries = MongoInquiryRepository()
+        self.status_checks = MongoStatusCheckRepository()
+
+    async def ping(self) -> bool:
+        await get_db().command("ping")
+        return True
+
+    async def prepare(self) -> None:
+        await database.ensure_indexes()
+
+    def close(self) -> None:
+        database.close()
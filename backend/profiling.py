@@ -0,0 +1,164 @@
+import hmac
+import json
+import logging
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+from config import Settings
+from logging_setup import request_id_var
+
+logger = logging.getLogger(__name__)
+
+
+def _folded_stack(frame) -> str:
+    """Render a frame chain root-first in Brendan Gregg's folded format"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{Path(code.co_filename).name}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """Sample one thread's stack at a fixed interval from a helper thread.
+
+    Profiling an async handler means sampling the event loop thread, so
+    stacks of other requests running concurrently on the same loop show up
+    too; at low traffic (or with a dedicated canary worker) they are noise.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def join(self) -> None:
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples[_folded_stack(frame)] += 1
+
+
+class ProfileStore:
+    """Write profiles to a directory, deleting the oldest beyond a size cap"""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    def save(self, name: str, samples: Counter, meta: dict) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        folded = "".join(f"{stack} {count}\n" for stack, count in samples.most_common())
+        (self.directory / f"{name}.folded").write_text(folded)
+        (self.directory / f"{name}.json").write_text(json.dumps(meta, indent=2))
+        self._enforce_cap()
+
+    def _enforce_cap(self) -> None:
+        files = sorted(
+            (p for p in self.directory.iterdir() if p.suffix in (".folded", ".json")),
+            key=lambda p: p.stat().st_mtime,
+        )
+        total = sum(p.stat().st_size for p in files)
+        for path in files:
+            if total <= self.max_bytes:
+                break
+            total -= path.stat().st_size
+            path.unlink(missing_ok=True)
+
+
+def _slug(path: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "-", path).strip("-")[:60] or "root"
+
+
+class ProfilingMiddleware:
+    """Profile a request when an admin asks for it or when it is sampled.
+
+    Only installed when PROFILE_TOKEN or PROFILE_SAMPLE_RATE is set, so
+    profiling costs nothing when disabled. At most one request is profiled
+    at a time per worker; others pass through untouched.
+    """
+
+    header = b"x-profile-token"
+
+    def __init__(self, app, settings: Settings):
+        self.app = app
+        self.token = settings.profile_token.encode() if settings.profile_token else None
+        self.sample_rate = settings.profile_sample_rate
+        self.interval = settings.profile_interval_ms / 1000
+        self.store = ProfileStore(settings.profile_dir, settings.profile_max_bytes)
+        self._busy = False
+
+    def _requested(self, scope) -> bool:
+        if self.token is not None:
+            for name, value in scope["headers"]:
+                if name == self.header:
+                    return hmac.compare_digest(value, self.token)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self._busy or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        self._busy = True
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{int(time.time_ns() % 1e9):09d}-{scope['method']}-{_slug(scope['path'])}"
+        status: Optional[int] = None
+
+        async def send_with_profile_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", name.encode())]
+            await send(message)
+
+        profiler = SamplingProfiler(threading.get_ident(), self.interval)
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profiler.stop()
+            self._busy = False
+            route = scope.get("route")
+            meta = {
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": route.path if route is not None else None,
+                "query_string": scope.get("query_string", b"").decode("latin-1"),
+                "status": status,
+                "request_id": request_id_var.get(),
+                "duration_ms": (time.perf_counter() - started) * 1000,
+                "interval_ms": self.interval * 1000,
+            }
+            # Join and write from a helper thread so the event loop never blocks on disk
+            threading.Thread(target=self._finish, args=(profiler, name, meta), daemon=True).start()
+
+    def _finish(self, profiler: SamplingProfiler, name: str, meta: dict) -> None:
+        profiler.join()
+        meta["samples"] = sum(profiler.samples.values())
+        try:
+            self.store.save(name, profiler.samples, meta)
+        except OSError as e:
+            logger.warning("Could not save profile %s: %s", name, e)
+
+
+def profiling_enabled(settings: Settings) -> bool:
+    return bool(settings.profile_token) or settings.profile_sample_rate > 0
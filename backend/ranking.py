@@ -0,0 +1,109 @@
+"""
+Fractional rank keys for manually ordered collections
+
+Ranks are base-36 strings compared lexicographically. A key strictly between
+any two keys always exists, so moving one item rewrites only that item's
+`rank`. Keys never end in "0", which guarantees there is always room below
+the smallest key as well.
+"""
+
+from datetime import datetime, timezone
+from typing import Optional
+
+DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+BASE = len(DIGITS)
+
+# Timestamp-derived keys count down from here so newer items sort first
+_TIMESTAMP_WIDTH = 10
+_TIMESTAMP_MAX = BASE ** _TIMESTAMP_WIDTH - 1
+
+
+def _encode(value: int, width: int) -> str:
+    digits = []
+    for _ in range(width):
+        value, digit = divmod(value, BASE)
+        digits.append(DIGITS[digit])
+    return "".join(reversed(digits))
+
+
+def rank_between(lo: Optional[str], hi: Optional[str]) -> str:
+    """Return a key strictly between lo and hi (None means unbounded)"""
+    if lo is not None and hi is not None and lo >= hi:
+        raise ValueError(f"rank {lo!r} is not below {hi!r}")
+    lo = lo or ""
+    result = []
+    i = 0
+    while True:
+        lo_digit = DIGITS.index(lo[i]) if i < len(lo) else 0
+        if hi is None:
+            hi_digit = BASE
+        else:
+            hi_digit = DIGITS.index(hi[i]) if i < len(hi) else 0
+        if hi_digit - lo_digit > 1:
+            result.append(DIGITS[(lo_digit + hi_digit) // 2])
+            return "".join(result)
+        result.append(DIGITS[lo_digit])
+        if hi_digit - lo_digit == 1:
+            # The prefix is now below hi, so the rest only has to exceed lo
+            hi = None
+        i += 1
+
+
+def rank_from_timestamp(created_at: datetime, item_id: str = "") -> str:
+    """Deterministic key ordering items newest first by created_at.
+
+    Used for documents created before manual ordering existed (see
+    migrations.py) and for newly created items, so the default order stays "newest first".
+    A few characters of the id break ties between equal timestamps.
+    """
+    if created_at.tzinfo is None:
+        # Documents store naive UTC datetimes
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    micros = int(created_at.timestamp() * 1_000_000)
+    tiebreak = "".join(c for c in str(item_id).lower() if c in DIGITS)[:4]
+    return _encode(_TIMESTAMP_MAX - micros, _TIMESTAMP_WIDTH) + tiebreak + "i"
+
+
+async def rank_for_new_item(repository, created_at: datetime, item_id: str) -> str:
+    """Rank placing a new unpinned item at the top of the unpinned items"""
+    candidate = rank_from_timestamp(created_at, item_id)
+    first = await repository.adjacent_rank(pinned=False)
+    if first is None or candidate < first:
+        return candidate
+    # An item was manually moved above every timestamp-derived key
+    return rank_between(None, first)
+
+
+async def rank_for_position(
+    repository,
+    item_id: str,
+    pinned: bool,
+    after_id: Optional[str] = None,
+    before_id: Optional[str] = None,
+) -> str:
+    """Rank placing item_id after after_id and/or before before_id within its pinned group.
+
+    With neither neighbour the item moves to the top of the group. Raises
+    LookupError for unknown neighbours and ValueError for neighbours in the
+    other group or in the wrong order.
+    """
+    async def neighbour_rank(neighbour_id: str) -> str:
+        neighbour = await repository.get(neighbour_id)
+        if neighbour is None:
+            raise LookupError(neighbour_id)
+        if bool(neighbour.get("pinned")) != pinned:
+            raise ValueError(f"item {neighbour_id} is in the other pinned group")
+        return neighbour["rank"]
+
+    lo = await neighbour_rank(after_id) if after_id else None
+    hi = await neighbour_rank(before_id) if before_id else None
+
+    if after_id and not before_id:
+        hi = await repository.adjacent_rank(pinned, exclude_id=item_id, above=lo)
+    elif before_id and not after_id:
+        lo = await repository.adjacent_rank(pinned, exclude_id=item_id, below=hi)
+    elif not after_id and not before_id:
+        hi = await repository.adjacent_rank(pinned, exclude_id=item_id)
+
+    return rank_between(lo, hi)
+
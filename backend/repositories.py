@@ -0,0 +1,297 @@
+"""
+Storage repositories
+
+Routes and background jobs talk to storage through one repository per
+entity instead of Motor collections. Documents are plain dicts shaped like
+the Mongo documents (`_id`, snake_case fields, datetimes), whatever the
+backend. Every read and write is restricted to the current tenant (see
+tenancy.py): inserted documents get its `tenant_id` and documents of other
+tenants are invisible, even by id.
+
+STORAGE_BACKEND selects the implementation:
+
+- `mongo` (default): mongo_repositories.py, backed by database.py
+- `sqlite`: sqlite_repositories.py, an embedded store in SQLITE_PATH
+  (`:memory:` for tests and benchmarks). With STORAGE_READ_ONLY it serves a
+  file exported from Mongo on read-only edge nodes.
+"""
+
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import resilience
+import tenancy
+from config import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class PortfolioRepository(ABC):
+    @abstractmethod
+    async def list(self, active_only: bool, type_filter: Optional[str] = None) -> List[dict]:
+        """Items in listing order: pinned first, then by rank"""
+
+    @abstractmethod
+    async def get(self, item_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def get_many(self, ids: List[str]) -> List[dict]:
+        """The items that exist among ids, in no particular order"""
+
+    @abstractmethod
+    async def insert(self, document: dict) -> dict:
+        ...
+
+    @abstractmethod
+    async def update(self, item_id: str, fields: dict) -> Optional[dict]:
+        """Set fields on an item and return it as it was before the update"""
+
+    @abstractmethod
+    async def delete(self, item_id: str) -> Optional[dict]:
+        """Delete an item and return it"""
+
+    @abstractmethod
+    async def adjacent_rank(
+        self,
+        pinned: bool,
+        exclude_id: Optional[str] = None,
+        above: Optional[str] = None,
+        below: Optional[str] = None,
+    ) -> Optional[str]:
+        """Nearest rank in a pinned group: the first above `above`, the last
+        below `below`, or the first overall when neither is given"""
+
+    @abstractmethod
+    async def count_active(self) -> int:
+        ...
+
+
+class TestimonialRepository(ABC):
+    @abstractmethod
+    async def list(
+        self,
+        active_only: bool,
+        min_subscribers: Optional[int] = None,
+        max_subscribers: Optional[int] = None,
+        sort: str = "created_at",
+        order: str = "desc",
+    ) -> List[dict]:
+        ...
+
+    @abstractmethod
+    async def get_many(self, ids: List[str]) -> List[dict]:
+        ...
+
+    @abstractmethod
+    async def insert(self, document: dict) -> dict:
+        ...
+
+    @abstractmethod
+    async def rating_summary(self) -> Tuple[int, float]:
+        """Number of active testimonials and the sum of their ratings"""
+
+
+class StatsRepository(ABC):
+    """Stats entries and the raw counters live stats are computed from"""
+
+    @abstractmethod
+    async def list(self) -> List[dict]:
+        """Entries by display order"""
+
+    @abstractmethod
+    async def get(self, stat_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def update(self, stat_id: str, fields: dict) -> Optional[dict]:
+        """Set fields on an entry and return it as it was before the update"""
+
+    @abstractmethod
+    async def set_metric_number(self, metric: str, number: str, updated_at) -> None:
+        """Set `number` to number + suffix on every entry bound to metric"""
+
+    @abstractmethod
+    async def increment_counter(self, name: str, delta: float) -> float:
+        """Atomically add delta to a counter and return the new value"""
+
+    @abstractmethod
+    async def get_counters(self, names: Iterable[str]) -> Dict[str, float]:
+        ...
+
+    @abstractmethod
+    async def set_counters(self, values: Dict[str, float]) -> None:
+        ...
+
+
+class InquiryRepository(ABC):
+    @abstractmethod
+    async def list(
+        self,
+        status: Optional[str] = None,
+        min_subscribers: Optional[int] = None,
+        max_subscribers: Optional[int] = None,
+        sort: str = "created_at",
+        order: str = "desc",
+        limit: int = 50,
+    ) -> List[dict]:
+        ...
+
+    @abstractmethod
+    async def insert(self, document: dict) -> dict:
+        ...
+
+    @abstractmethod
+    async def get(self, inquiry_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def get_many(self, ids: List[str]) -> List[dict]:
+        ...
+
+    @abstractmethod
+    async def update(self, inquiry_id: str, fields: dict, statuses: Optional[List[str]] = None) -> Optional[dict]:
+        """Set fields on an inquiry and return it as it was before the update.
+
+        With statuses, only an inquiry currently in one of them is updated;
+        None means it was not found or not in those statuses.
+        """
+
+    @abstractmethod
+    async def update_many(
+        self,
+        fields: dict,
+        ids: Optional[List[str]] = None,
+        statuses: Optional[List[str]] = None,
+        created_before: Optional[datetime] = None,
+    ) -> Tuple[int, int]:
+        """Set fields on every inquiry matching all given conditions in one
+        statement; returns the matched and modified counts"""
+
+    @abstractmethod
+    async def count(self, status: Optional[str] = None) -> int:
+        ...
+
+
+class StatusCheckRepository(ABC):
+    @abstractmethod
+    async def list(self, limit: int = 1000) -> List[dict]:
+        ...
+
+    @abstractmethod
+    async def insert(self, document: dict) -> dict:
+        ...
+
+
+class Storage(ABC):
+    """One backend's repositories plus its lifecycle"""
+
+    name: str
+    read_only: bool = False
+    # Errors meaning storage is unreachable or overloaded (see resilience.py)
+    transient_errors: Tuple[type, ...] = ()
+    portfolio: PortfolioRepository
+    testimonials: TestimonialRepository
+    stats: StatsRepository
+    inquiries: InquiryRepository
+    status_checks: StatusCheckRepository
+
+    @abstractmethod
+    async def ping(self) -> bool:
+        ...
+
+    @abstractmethod
+    async def prepare(self) -> None:
+        """Create indexes or schema"""
+
+    @abstractmethod
+    def close(self) -> None:
+        ...
+
+
+def sort_fields(sort: str, order: str) -> List[Tuple[str, int]]:
+    """Sort keys for the created_at/subscribers listings, shared by the backends"""
+    direction = 1 if order == "asc" else -1
+    if sort == "subscribers":
+        # The tie-breaker follows the direction, so one index serves both orders
+        return [("subscriber_count", direction), ("created_at", direction)]
+    return [("created_at", direction)]
+
+
+# Like the Mongo client, storage is opened by the application lifespan (or
+# lazily on first use), never at import time.
+_storage: Optional[Storage] = None
+_warmup_complete = asyncio.Event()
+
+
+def open_storage(settings: Settings) -> Storage:
+    """Create the configured backend if it does not exist yet"""
+    global _storage
+    if _storage is None:
+        if settings.storage_backend == "sqlite":
+            from sqlite_repositories import SqliteStorage
+            _storage = SqliteStorage(settings.sqlite_path, read_only=settings.storage_read_only)
+        elif settings.storage_backend == "mongo":
+            from mongo_repositories import MongoStorage
+            _storage = MongoStorage()
+        else:
+            raise ValueError(f"Unknown STORAGE_BACKEND {settings.storage_backend!r}")
+        resilience.protect(_storage, settings)
+    return _storage
+
+
+def get_storage() -> Storage:
+    """Return the application storage, opening it lazily if needed"""
+    return open_storage(get_settings())
+
+
+def close_storage() -> None:
+    """Close the storage and reset readiness"""
+    global _storage
+    if _storage is not None:
+        _storage.close()
+        _storage = None
+    _warmup_complete.clear()
+
+
+async def ping(timeout: float = 2.0) -> bool:
+    """Check that the storage answers within timeout seconds"""
+    try:
+        return await asyncio.wait_for(get_storage().ping(), timeout)
+    except Exception as e:
+        logger.warning("Storage ping failed: %s", e)
+        return False
+
+
+async def _prime_queries(storage: Storage) -> None:
+    """Run the landing page queries once so the pool and working set are warm"""
+    await asyncio.gather(
+        storage.portfolio.list(active_only=True),
+        storage.testimonials.list(active_only=True),
+        storage.stats.list(),
+    )
+
+
+async def warm_up() -> None:
+    """Prime indexes and caches, then mark the service ready"""
+    settings = get_settings()
+    if settings.warmup_on_startup:
+        try:
+            storage = get_storage()
+            await asyncio.wait_for(storage.prepare(), settings.warmup_timeout)
+            for tenant in tenancy.tenants():
+                with tenancy.use(tenant):
+                    await asyncio.wait_for(_prime_queries(storage), settings.warmup_timeout)
+            logger.info("Warm-up completed")
+        except Exception as e:
+            # Readiness is still gated on the storage ping, so a failed
+            # warm-up only costs us the primed caches, not correctness.
+            logger.warning("Warm-up failed: %s", e)
+    _warmup_complete.set()
+
+
+def is_warm() -> bool:
+    return _warmup_complete.is_set()
@@ -0,0 +1,254 @@
+"""
+Riding out storage outages
+
+Every repository call goes through a circuit breaker with a per-call
+deadline. After STORAGE_BREAKER_THRESHOLD consecutive timeouts or
+connection errors the breaker opens and calls fail immediately with
+`StorageUnavailable` (503 with Retry-After) instead of piling up on a dead
+primary. After STORAGE_BREAKER_RESET seconds a single call is let through
+as a probe; its success closes the breaker again.
+
+Public read routes keep their last good response. When they fail,
+`StaleWhileRevalidateMiddleware` serves that response instead, marked with
+`Warning: 110` and an `Age` header, and refreshes it in the background.
+Responses are kept per tenant.
+"""
+
+import asyncio
+import functools
+import inspect
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple, Type
+from urllib.parse import parse_qsl
+
+from fastapi import HTTPException
+
+from config import Settings
+from tenancy import current_tenant
+
+logger = logging.getLogger(__name__)
+
+# Public read routes (also a route class of backpressure.py). Their GET
+# responses may be served stale; admin data never is.
+PUBLIC_READ_PREFIXES = ("/api/portfolio", "/api/testimonials", "/api/stats", "/api/snapshots")
+# Query values FastAPI parses as true
+_TRUE_VALUES = ("1", "true", "t", "on", "yes", "y")
+
+
+def _is_public(scope) -> bool:
+    if not scope["path"].startswith(PUBLIC_READ_PREFIXES):
+        return False
+    # ?active=false lists inactive items, which only admins see
+    query = parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True)
+    return all(value.lower() in _TRUE_VALUES for name, value in query if name == "active")
+
+
+class StorageUnavailable(HTTPException):
+    def __init__(self, retry_after: float):
+        super().__init__(
+            status_code=503,
+            detail="Storage temporarily unavailable",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_threshold: int,
+        reset_timeout: float,
+        call_timeout: float,
+        transient_errors: Tuple[Type[BaseException], ...] = (),
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.call_timeout = call_timeout
+        self.transient_errors = transient_errors
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def _retry_after(self) -> float:
+        if self.opened_at is None:
+            return self.reset_timeout
+        return self.reset_timeout - (time.monotonic() - self.opened_at)
+
+    async def call(self, fn, *args, **kwargs):
+        state = self.state
+        if state == "open" or (state == "half-open" and self._probing):
+            raise StorageUnavailable(self._retry_after())
+
+        probe = state == "half-open"
+        self._probing = probe
+        try:
+            result = await asyncio.wait_for(fn(*args, **kwargs), self.call_timeout)
+        except (asyncio.TimeoutError, *self.transient_errors) as e:
+            self._record_failure(e)
+            raise StorageUnavailable(self._retry_after()) from e
+        except asyncio.CancelledError:
+            # Says nothing about storage health (e.g. the client went away)
+            raise
+        except BaseException:
+            # Anything else (duplicate key, validation...) means storage answered
+            self._record_success()
+            raise
+        finally:
+            if probe:
+                self._probing = False
+        self._record_success()
+        return result
+
+    def _record_success(self) -> None:
+        if self.opened_at is not None:
+            logger.info("Storage circuit closed")
+        self.failures = 0
+        self.opened_at = None
+
+    def _record_failure(self, error: BaseException) -> None:
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logger.warning("Storage circuit opened after %s failures: %r", self.failures, error)
+            self.opened_at = time.monotonic()
+
+
+class _Guarded:
+    """Proxy running every coroutine method of target through the breaker"""
+
+    def __init__(self, target, breaker: CircuitBreaker):
+        self._target = target
+        self._breaker = breaker
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not inspect.iscoroutinefunction(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def guarded(*args, **kwargs):
+            return await self._breaker.call(attr, *args, **kwargs)
+        return guarded
+
+
+REPOSITORIES = ("portfolio", "testimonials", "stats", "inquiries", "status_checks")
+
+
+def protect(storage, settings: Settings) -> CircuitBreaker:
+    """Put a circuit breaker in front of every repository of storage"""
+    breaker = CircuitBreaker(
+        settings.storage_breaker_threshold,
+        settings.storage_breaker_reset,
+        settings.storage_call_timeout,
+        storage.transient_errors,
+    )
+    for name in REPOSITORIES:
+        setattr(storage, name, _Guarded(getattr(storage, name), breaker))
+    storage.breaker = breaker
+    return breaker
+
+
+class StaleWhileRevalidateMiddleware:
+    """Replay the last good response of a public read when the route fails"""
+
+    def __init__(self, app, max_entries: int):
+        self.app = app
+        self.max_entries = max_entries
+        # key -> (monotonic time stored, response start message, body)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._revalidating = set()
+
+    @staticmethod
+    def _key(scope) -> str:
+        return f"{current_tenant()}:{scope['path']}?{scope.get('query_string', b'').decode('latin-1')}"
+
+    def _store(self, key: str, start: dict, body: bytes) -> None:
+        self._entries[key] = (time.monotonic(), start, body)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "GET"
+            or not _is_public(scope)
+            or self.max_entries <= 0
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        key = self._key(scope)
+        # Routing adds keys to the scope; revalidation needs the original
+        pristine_scope = dict(scope)
+        start: Optional[dict] = None
+        chunks = []
+        serving_stale = False
+
+        async def send_or_replace(message):
+            nonlocal start, serving_stale
+            if message["type"] == "http.response.start":
+                entry = self._entries.get(key)
+                if message["status"] >= 500 and entry is not None:
+                    serving_stale = True
+                    await self._send_stale(entry, send)
+                    self._revalidate(key, pristine_scope)
+                    return
+                # Outer middlewares append their headers to the message we forward
+                start = {**message, "headers": list(message.get("headers", []))}
+            elif serving_stale:
+                return
+            elif start is not None and start["status"] == 200:
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    self._store(key, start, b"".join(chunks))
+            await send(message)
+
+        await self.app(scope, receive, send_or_replace)
+
+    async def _send_stale(self, entry: tuple, send) -> None:
+        stored_at, start, body = entry
+        headers = [(name, value) for name, value in start["headers"] if name.lower() not in (b"age", b"warning")]
+        headers.append((b"age", str(int(time.monotonic() - stored_at)).encode()))
+        headers.append((b"warning", b'110 - "Response is Stale"'))
+        await send({**start, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    def _revalidate(self, key: str, scope: dict) -> None:
+        if key in self._revalidating:
+            return
+        self._revalidating.add(key)
+        asyncio.create_task(self._refresh(key, scope))
+
+    async def _refresh(self, key: str, scope: dict) -> None:
+        start: Optional[dict] = None
+        chunks = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def collect(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+            else:
+                chunks.append(message.get("body", b""))
+
+        try:
+            await self.app(dict(scope), receive, collect)
+            if start is not None and start["status"] == 200:
+                self._store(key, start, b"".join(chunks))
+        except Exception as e:
+            logger.debug("Background revalidation of %s failed: %s", key, e)
+        finally:
+            self._revalidating.discard(key)
@@ -1,41 +1,86 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, UploadFile, File
+from typing import List, Literal, Optional
 from models import (
-    PortfolioItem, PortfolioItemCreate, PortfolioItemUpdate,
-    Testimonial, TestimonialCreate, TestimonialUpdate,
-    Stats, StatsCreate, StatsUpdate,
+    PortfolioItem, PortfolioItemCreate, PortfolioItemUpdate, PortfolioPositionUpdate,
+    PortfolioImage, ImageVariant, PortfolioLookup,
+    Testimonial, TestimonialCreate, TestimonialUpdate, TestimonialLookup,
+    Stats, StatsCreate, StatsUpdate, StatsMetric,
     ContactInquiry, ContactInquiryCreate, ContactInquiryUpdate,
+    ContactInquiryBulkStatusUpdate, ContactInquiryBulkStatusResult, inquiry_sources,
     PortfolioType, InquiryStatus
 )
-from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime
-import os
 import logging
-from dotenv import load_dotenv
-from pathlib import Path
 
-# Load environment variables
-load_dotenv(Path(__file__).parent / '.env')
+import counters
+import media
+import migrations
+import ranking
+import snapshots
+from cache import item_cache
+from config import get_settings
+from repositories import get_storage
+from tracing import route_class
 
 logger = logging.getLogger(__name__)
 
-# Database connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+router = APIRouter(route_class=route_class(get_settings()))
 
-router = APIRouter()
 
-
-# Helper function to convert MongoDB document to dict
-def document_helper(document) -> dict:
+# Helper function to convert MongoDB document to dict, upcasting documents
+# from `collection` that predate a pending migration
+def document_helper(document, collection: Optional[str] = None) -> dict:
     if document:
+        if collection:
+            migrations.upcast(collection, document)
         document["id"] = str(document["_id"])
         document.pop("_id", None)
         return document
     return None
 
 
+MAX_LOOKUP_IDS = 100
+
+
+def parse_ids(ids: List[str]) -> List[str]:
+    """Accept both ?ids=a,b and ?ids=a&ids=b"""
+    parsed = [i.strip() for value in ids for i in value.split(",") if i.strip()]
+    if len(parsed) > MAX_LOOKUP_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_LOOKUP_IDS} ids per lookup")
+    return parsed
+
+
+async def find_by_ids(collection: str, ids: List[str], active_only: bool) -> List[Optional[dict]]:
+    """Fetch documents by id in request order (None for misses).
+
+    Cached documents are served from the per-id cache; everything else is
+    fetched with a single indexed lookup on the primary key.
+    """
+    found = {}
+    misses = []
+    for item_id in dict.fromkeys(ids):
+        cached = item_cache.get(collection, item_id)
+        if cached is not None:
+            found[item_id] = cached
+        else:
+            misses.append(item_id)
+
+    if misses:
+        repository = get_storage().portfolio if collection == "portfolio_items" else get_storage().testimonials
+        for document in await repository.get_many(misses):
+            document = document_helper(document, collection)
+            item_cache.set(collection, document["id"], document)
+            found[document["id"]] = document
+
+    results = []
+    for item_id in ids:
+        document = found.get(item_id)
+        if document is not None and active_only and not document.get("is_active"):
+            document = None
+        results.append(document)
+    return results
+
+
 # Portfolio Routes
 @router.get("/portfolio", response_model=List[PortfolioItem])
 async def get_portfolio_items(
@@ -44,20 +89,53 @@ async def get_portfolio_items(
 ):
     """Get all portfolio items with optional filtering"""
     try:
-        query = {}
-        if active_only:
-            query["is_active"] = True
-        if type_filter:
-            query["type"] = type_filter.value
-        
-        cursor = db.portfolio_items.find(query).sort("created_at", -1)
-        portfolio_items = await cursor.to_list(1000)
-        return [document_helper(item) for item in portfolio_items]
+        portfolio_items = await get_storage().portfolio.list(
+            active_only, type_filter.value if type_filter else None
+        )
+        return [document_helper(item, "portfolio_items") for item in portfolio_items]
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error fetching portfolio items: {e}")
+        logger.error("Error fetching portfolio items: %s", e)
         raise HTTPException(status_code=500, detail="Error fetching portfolio items")
 
 
+@router.get("/portfolio/lookup", response_model=PortfolioLookup)
+async def lookup_portfolio_items(
+    ids: List[str] = Query(...),
+    active_only: bool = Query(True, alias="active")
+):
+    """Get several portfolio items by id, in the order requested"""
+    try:
+        requested = parse_ids(ids)
+        items = await find_by_ids("portfolio_items", requested, active_only)
+        return {
+            "items": items,
+            "missing": [item_id for item_id, item in zip(requested, items) if item is None],
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error looking up portfolio items: %s", e)
+        raise HTTPException(status_code=500, detail="Error looking up portfolio items")
+
+
+@router.get("/portfolio/{item_id}", response_model=PortfolioItem)
+async def get_portfolio_item(item_id: str, active_only: bool = Query(True, alias="active")):
+    """Get a single portfolio item"""
+    try:
+        [item] = await find_by_ids("portfolio_items", [item_id], active_only)
+        if item:
+            return item
+
+        raise HTTPException(status_code=404, detail="Portfolio item not found")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error fetching portfolio item: %s", e)
+        raise HTTPException(status_code=500, detail="Error fetching portfolio item")
+
+
 @router.post("/portfolio", response_model=PortfolioItem)
 async def create_portfolio_item(item: PortfolioItemCreate):
     """Create a new portfolio item"""
@@ -65,15 +143,23 @@ async def create_portfolio_item(item: PortfolioItemCreate):
         portfolio_item = PortfolioItem(**item.dict())
         item_dict = portfolio_item.dict()
         item_dict["_id"] = item_dict.pop("id")
+        portfolio = get_storage().portfolio
+        # New items go to the top of their group, like the old created_at order
+        if portfolio_item.pinned:
+            item_dict["rank"] = await ranking.rank_for_position(portfolio, item_dict["_id"], pinned=True)
+        else:
+            item_dict["rank"] = await ranking.rank_for_new_item(
+                portfolio, portfolio_item.created_at, item_dict["_id"]
+            )
         
-        result = await db.portfolio_items.insert_one(item_dict)
-        if result.inserted_id:
-            created_item = await db.portfolio_items.find_one({"_id": result.inserted_id})
-            return document_helper(created_item)
-        
-        raise HTTPException(status_code=500, detail="Failed to create portfolio item")
+        created_item = await portfolio.insert(item_dict)
+        await counters.apply(counters.portfolio_deltas(None, created_item))
+        snapshots.schedule_publish()
+        return document_helper(created_item)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error creating portfolio item: {e}")
+        logger.error("Error creating portfolio item: %s", e)
         raise HTTPException(status_code=500, detail="Error creating portfolio item")
 
 
@@ -85,52 +171,185 @@ async def update_portfolio_item(item_id: str, item_update: PortfolioItemUpdate):
         if update_data:
             update_data["updated_at"] = datetime.utcnow()
             
-            result = await db.portfolio_items.update_one(
-                {"_id": item_id},
-                {"$set": update_data}
-            )
+            # Fetch the previous version in the same round trip so live
+            # counters can tell whether the item was (de)activated
+            previous_item = await get_storage().portfolio.update(item_id, update_data)
             
-            if result.modified_count:
-                updated_item = await db.portfolio_items.find_one({"_id": item_id})
-                return document_helper(updated_item)
+            if previous_item:
+                item_cache.invalidate("portfolio_items", item_id)
+                updated_item = {**previous_item, **update_data}
+                await counters.apply(counters.portfolio_deltas(previous_item, updated_item))
+                snapshots.schedule_publish()
+                return document_helper(updated_item, "portfolio_items")
         
         raise HTTPException(status_code=404, detail="Portfolio item not found or no changes made")
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error updating portfolio item: {e}")
+        logger.error("Error updating portfolio item: %s", e)
         raise HTTPException(status_code=500, detail="Error updating portfolio item")
 
 
+@router.put("/portfolio/{item_id}/position", response_model=PortfolioItem)
+async def update_portfolio_position(item_id: str, position: PortfolioPositionUpdate):
+    """Move a portfolio item between two others (only the moved item is written)"""
+    try:
+        portfolio = get_storage().portfolio
+        item = await portfolio.get(item_id)
+        if not item:
+            raise HTTPException(status_code=404, detail="Portfolio item not found")
+
+        pinned = position.pinned if position.pinned is not None else bool(item.get("pinned"))
+        try:
+            rank = await ranking.rank_for_position(
+                portfolio, item_id, pinned, position.after_id, position.before_id
+            )
+        except LookupError as e:
+            raise HTTPException(status_code=404, detail=f"Neighbouring portfolio item {e} not found")
+        except ValueError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+
+        update_data = {"rank": rank, "pinned": pinned, "updated_at": datetime.utcnow()}
+        previous_item = await portfolio.update(item_id, update_data)
+        if previous_item:
+            updated_item = {**previous_item, **update_data}
+            item_cache.invalidate("portfolio_items", item_id)
+            snapshots.schedule_publish()
+            return document_helper(updated_item, "portfolio_items")
+
+        raise HTTPException(status_code=404, detail="Portfolio item not found")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error moving portfolio item: %s", e)
+        raise HTTPException(status_code=500, detail="Error moving portfolio item")
+
+
+@router.post("/portfolio/{item_id}/image", response_model=PortfolioItem)
+async def upload_portfolio_image(item_id: str, file: UploadFile = File(...)):
+    """Upload a portfolio thumbnail; responsive variants are rendered off the event loop"""
+    try:
+        settings = get_settings()
+        portfolio = get_storage().portfolio
+        if not await portfolio.get(item_id):
+            raise HTTPException(status_code=404, detail="Portfolio item not found")
+
+        data = await file.read(settings.media_max_upload_bytes + 1)
+        if len(data) > settings.media_max_upload_bytes:
+            raise HTTPException(status_code=413, detail="Image too large")
+
+        try:
+            manifest = await media.process_image(data, settings)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        image = PortfolioImage(
+            hash=manifest["hash"],
+            width=manifest["width"],
+            height=manifest["height"],
+            variants=[
+                ImageVariant(
+                    url=media.variant_url(settings, variant["path"]),
+                    width=variant["width"],
+                    height=variant["height"],
+                    format=variant["format"],
+                )
+                for variant in manifest["variants"]
+            ],
+        )
+        update_data = {"image": image.dict(), "updated_at": datetime.utcnow()}
+        previous_item = await portfolio.update(item_id, update_data)
+        if previous_item:
+            updated_item = {**previous_item, **update_data}
+            item_cache.invalidate("portfolio_items", item_id)
+            snapshots.schedule_publish()
+            return document_helper(updated_item, "portfolio_items")
+
+        raise HTTPException(status_code=404, detail="Portfolio item not found")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error uploading portfolio image: %s", e)
+        raise HTTPException(status_code=500, detail="Error uploading portfolio image")
+
+
 @router.delete("/portfolio/{item_id}")
 async def delete_portfolio_item(item_id: str):
     """Delete a portfolio item"""
     try:
-        result = await db.portfolio_items.delete_one({"_id": item_id})
-        if result.deleted_count:
+        deleted_item = await get_storage().portfolio.delete(item_id)
+        if deleted_item:
+            item_cache.invalidate("portfolio_items", item_id)
+            await counters.apply(counters.portfolio_deltas(deleted_item, None))
+            snapshots.schedule_publish()
             return {"message": "Portfolio item deleted successfully"}
         
         raise HTTPException(status_code=404, detail="Portfolio item not found")
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error deleting portfolio item: {e}")
+        logger.error("Error deleting portfolio item: %s", e)
         raise HTTPException(status_code=500, detail="Error deleting portfolio item")
 
 
 # Testimonial Routes
 @router.get("/testimonials", response_model=List[Testimonial])
-async def get_testimonials(active_only: bool = Query(True, alias="active")):
-    """Get all testimonials"""
+async def get_testimonials(
+    active_only: bool = Query(True, alias="active"),
+    sort: Literal["created_at", "subscribers"] = Query("created_at"),
+    order: Literal["asc", "desc"] = Query("desc"),
+    min_subscribers: Optional[int] = Query(None, ge=0),
+    max_subscribers: Optional[int] = Query(None, ge=0)
+):
+    """Get all testimonials, optionally sorted or filtered by channel size"""
     try:
-        query = {}
-        if active_only:
-            query["is_active"] = True
-            
-        cursor = db.testimonials.find(query).sort("created_at", -1)
-        testimonials = await cursor.to_list(1000)
-        return [document_helper(testimonial) for testimonial in testimonials]
+        testimonials = await get_storage().testimonials.list(
+            active_only, min_subscribers, max_subscribers, sort, order
+        )
+        return [document_helper(testimonial, "testimonials") for testimonial in testimonials]
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error fetching testimonials: {e}")
+        logger.error("Error fetching testimonials: %s", e)
         raise HTTPException(status_code=500, detail="Error fetching testimonials")
 
 
+@router.get("/testimonials/lookup", response_model=TestimonialLookup)
+async def lookup_testimonials(
+    ids: List[str] = Query(...),
+    active_only: bool = Query(True, alias="active")
+):
+    """Get several testimonials by id, in the order requested"""
+    try:
+        requested = parse_ids(ids)
+        testimonials = await find_by_ids("testimonials", requested, active_only)
+        return {
+            "items": testimonials,
+            "missing": [item_id for item_id, item in zip(requested, testimonials) if item is None],
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error looking up testimonials: %s", e)
+        raise HTTPException(status_code=500, detail="Error looking up testimonials")
+
+
+@router.get("/testimonials/{testimonial_id}", response_model=Testimonial)
+async def get_testimonial(testimonial_id: str, active_only: bool = Query(True, alias="active")):
+    """Get a single testimonial"""
+    try:
+        [testimonial] = await find_by_ids("testimonials", [testimonial_id], active_only)
+        if testimonial:
+            return testimonial
+
+        raise HTTPException(status_code=404, detail="Testimonial not found")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error fetching testimonial: %s", e)
+        raise HTTPException(status_code=500, detail="Error fetching testimonial")
+
+
 @router.post("/testimonials", response_model=Testimonial)
 async def create_testimonial(testimonial: TestimonialCreate):
     """Create a new testimonial"""
@@ -139,14 +358,14 @@ async def create_testimonial(testimonial: TestimonialCreate):
         testimonial_dict = testimonial_obj.dict()
         testimonial_dict["_id"] = testimonial_dict.pop("id")
         
-        result = await db.testimonials.insert_one(testimonial_dict)
-        if result.inserted_id:
-            created_testimonial = await db.testimonials.find_one({"_id": result.inserted_id})
-            return document_helper(created_testimonial)
-        
-        raise HTTPException(status_code=500, detail="Failed to create testimonial")
+        created_testimonial = await get_storage().testimonials.insert(testimonial_dict)
+        await counters.apply(counters.testimonial_deltas(None, created_testimonial))
+        snapshots.schedule_publish()
+        return document_helper(created_testimonial)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error creating testimonial: {e}")
+        logger.error("Error creating testimonial: %s", e)
         raise HTTPException(status_code=500, detail="Error creating testimonial")
 
 
@@ -155,37 +374,68 @@ async def create_testimonial(testimonial: TestimonialCreate):
 async def get_stats():
     """Get all stats ordered by order field"""
     try:
-        cursor = db.stats.find({}).sort("order", 1)
-        stats = await cursor.to_list(1000)
+        stats = await get_storage().stats.list()
         return [document_helper(stat) for stat in stats]
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error fetching stats: {e}")
+        logger.error("Error fetching stats: %s", e)
         raise HTTPException(status_code=500, detail="Error fetching stats")
 
 
 @router.put("/stats/{stat_id}", response_model=Stats)
 async def update_stats(stat_id: str, stats_update: StatsUpdate):
-    """Update a stats item"""
+    """Update a stats item; `metric: null` unbinds it from its live counter"""
     try:
-        update_data = {k: v for k, v in stats_update.dict().items() if v is not None}
+        # Other fields are left alone when null, metric is cleared
+        update_data = {
+            k: v for k, v in stats_update.dict(exclude_unset=True).items() if v is not None or k == "metric"
+        }
         if update_data:
+            stats = get_storage().stats
+            current = await stats.get(stat_id)
+            if not current:
+                raise HTTPException(status_code=404, detail="Stats item not found")
+            metric = update_data["metric"] if "metric" in update_data else current.get("metric")
+            if "number" in update_data and metric is not None:
+                raise HTTPException(
+                    status_code=409,
+                    detail="number follows the bound metric; set metric to null to edit it",
+                )
             update_data["updated_at"] = datetime.utcnow()
             
-            result = await db.stats.update_one(
-                {"_id": stat_id},
-                {"$set": update_data}
-            )
+            previous_stat = await stats.update(stat_id, update_data)
             
-            if result.modified_count:
-                updated_stat = await db.stats.find_one({"_id": stat_id})
+            if previous_stat:
+                # The number is rendered from the counter plus the suffix
+                if metric is not None and ("metric" in update_data or "suffix" in update_data):
+                    await counters.refresh_stats([StatsMetric(metric)])
+                snapshots.schedule_publish()
+                updated_stat = await stats.get(stat_id)
                 return document_helper(updated_stat)
         
         raise HTTPException(status_code=404, detail="Stats item not found or no changes made")
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error updating stats: {e}")
+        logger.error("Error updating stats: %s", e)
         raise HTTPException(status_code=500, detail="Error updating stats")
 
 
+# Snapshot Routes
+@router.get("/snapshots/manifest")
+async def get_snapshot_manifest():
+    """Point clients at the current static snapshot files"""
+    manifest = await snapshots.read_manifest() if snapshots.enabled() else None
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="Snapshots are not published")
+    prefix = snapshots.url_prefix()
+    return {
+        "generated_at": manifest["generated_at"],
+        "files": {name: f"{prefix}/{filename}" for name, filename in manifest["files"].items()},
+    }
+
+
 # Contact Inquiry Routes
 @router.post("/contact", response_model=ContactInquiry)
 async def create_contact_inquiry(inquiry: ContactInquiryCreate):
@@ -195,55 +445,110 @@ async def create_contact_inquiry(inquiry: ContactInquiryCreate):
         inquiry_dict = contact_inquiry.dict()
         inquiry_dict["_id"] = inquiry_dict.pop("id")
         
-        result = await db.contact_inquiries.insert_one(inquiry_dict)
-        if result.inserted_id:
-            created_inquiry = await db.contact_inquiries.find_one({"_id": result.inserted_id})
-            logger.info(f"New contact inquiry received from {inquiry.email}")
-            return document_helper(created_inquiry)
-        
-        raise HTTPException(status_code=500, detail="Failed to submit inquiry")
+        created_inquiry = await get_storage().inquiries.insert(inquiry_dict)
+        await counters.apply(counters.inquiry_deltas(None, created_inquiry))
+        logger.info(
+            "New contact inquiry received",
+            extra={"inquiry_id": created_inquiry["_id"], "service": inquiry.service},
+        )
+        return document_helper(created_inquiry)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error creating contact inquiry: {e}")
+        logger.error("Error creating contact inquiry: %s", e)
         raise HTTPException(status_code=500, detail="Error submitting inquiry")
 
 
 @router.get("/contact", response_model=List[ContactInquiry])
 async def get_contact_inquiries(
     status: Optional[InquiryStatus] = Query(None),
-    limit: int = Query(50, le=100)
+    limit: int = Query(50, le=100),
+    sort: Literal["created_at", "subscribers"] = Query("created_at"),
+    order: Literal["asc", "desc"] = Query("desc"),
+    min_subscribers: Optional[int] = Query(None, ge=0),
+    max_subscribers: Optional[int] = Query(None, ge=0)
 ):
     """Get contact inquiries (admin only - future authentication)"""
     try:
-        query = {}
-        if status:
-            query["status"] = status.value
-            
-        cursor = db.contact_inquiries.find(query).sort("created_at", -1).limit(limit)
-        inquiries = await cursor.to_list(limit)
-        return [document_helper(inquiry) for inquiry in inquiries]
+        inquiries = await get_storage().inquiries.list(
+            status.value if status else None, min_subscribers, max_subscribers, sort, order, limit
+        )
+        return [document_helper(inquiry, "contact_inquiries") for inquiry in inquiries]
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error fetching contact inquiries: {e}")
+        logger.error("Error fetching contact inquiries: %s", e)
         raise HTTPException(status_code=500, detail="Error fetching contact inquiries")
 
 
+@router.put("/contact/status", response_model=ContactInquiryBulkStatusResult)
+async def bulk_update_inquiry_status(bulk_update: ContactInquiryBulkStatusUpdate):
+    """Move many inquiries to a status in one update (admin only - future authentication)"""
+    try:
+        inquiries = get_storage().inquiries
+        sources = [status.value for status in inquiry_sources(bulk_update.status)]
+        update_data = {"status": bulk_update.status.value, "updated_at": datetime.utcnow()}
+        skipped, missing = [], []
+
+        if bulk_update.ids is not None:
+            ids = list(dict.fromkeys(bulk_update.ids))
+            current = {doc["_id"]: doc.get("status") for doc in await inquiries.get_many(ids)}
+            missing = [i for i in ids if i not in current]
+            skipped = [i for i in ids if i in current and current[i] not in sources]
+            # The status condition is checked again by the update itself
+            matched, modified = await inquiries.update_many(update_data, ids=ids, statuses=sources)
+        else:
+            selected = bulk_update.filter
+            if selected.status is not None and selected.status.value not in sources:
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"Inquiries cannot move from {selected.status.value} to {bulk_update.status.value}",
+                )
+            matched, modified = await inquiries.update_many(
+                update_data,
+                statuses=[selected.status.value] if selected.status else sources,
+                created_before=selected.created_before,
+            )
+
+        if modified:
+            await counters.recount_inquiries()
+        return {"matched": matched, "modified": modified, "skipped": skipped, "missing": missing}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error bulk updating inquiry status: %s", e)
+        raise HTTPException(status_code=500, detail="Error updating inquiry status")
+
+
 @router.put("/contact/{inquiry_id}/status", response_model=ContactInquiry)
 async def update_inquiry_status(inquiry_id: str, status_update: ContactInquiryUpdate):
     """Update inquiry status (admin only - future authentication)"""
     try:
+        inquiries = get_storage().inquiries
         update_data = {"updated_at": datetime.utcnow()}
+        statuses = None
         if status_update.status:
-            update_data["status"] = status_update.status.value
+            target = status_update.status
+            update_data["status"] = target.value
+            # Checked by the update itself, so concurrent changes cannot slip past
+            statuses = [target.value] + [s.value for s in inquiry_sources(target)]
             
-        result = await db.contact_inquiries.update_one(
-            {"_id": inquiry_id},
-            {"$set": update_data}
-        )
+        previous_inquiry = await inquiries.update(inquiry_id, update_data, statuses=statuses)
         
-        if result.modified_count:
-            updated_inquiry = await db.contact_inquiries.find_one({"_id": inquiry_id})
-            return document_helper(updated_inquiry)
+        if previous_inquiry:
+            updated_inquiry = {**previous_inquiry, **update_data}
+            await counters.apply(counters.inquiry_deltas(previous_inquiry, updated_inquiry))
+            return document_helper(updated_inquiry, "contact_inquiries")
         
+        current = await inquiries.get(inquiry_id) if statuses else None
+        if current:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Inquiry cannot move from {current.get('status')} to {status_update.status.value}",
+            )
         raise HTTPException(status_code=404, detail="Contact inquiry not found")
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error updating inquiry status: {e}")
+        logger.error("Error updating inquiry status: %s", e)
         raise HTTPException(status_code=500, detail="Error updating inquiry status")
\ No newline at end of file
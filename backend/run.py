@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Production entry point for the ContentCraft API
+
+Runs uvicorn with one worker per available core (WEB_CONCURRENCY overrides),
+using uvloop/httptools when they are installed. Each worker opens its own
+Mongo pool in the app lifespan and closes it when the worker shuts down.
+
+Usage (from backend/):
+    python run.py --workers 4 --port 8001
+"""
+
+import argparse
+import importlib.util
+import os
+import socket
+from pathlib import Path
+
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+from config import get_settings
+
+
+def available_cores() -> int:
+    """Number of cores this process may actually use (affinity and cgroup quota)"""
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+
+    # Containers often get a CPU quota smaller than the visible core count
+    try:
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()
+        if quota != "max":
+            cores = min(cores, max(1, int(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return max(1, cores)
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def event_loop() -> str:
+    return "uvloop" if _installed("uvloop") else "asyncio"
+
+
+def http_protocol() -> str:
+    return "httptools" if _installed("httptools") else "h11"
+
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    """Bind the listening socket shared by all workers.
+
+    The socket is created with an explicit IPPROTO_TCP protocol: worker
+    processes rebuild it from (family, type, proto), and asyncio only enables
+    TCP_NODELAY on accepted connections when proto is TCP. With uvicorn's own
+    proto=0 socket, multi-worker responses stall on Nagle/delayed-ACK.
+    """
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Run the ContentCraft API server")
+    parser.add_argument("--host", default=settings.host)
+    parser.add_argument("--port", type=int, default=settings.port)
+    parser.add_argument(
+        "--workers", type=int, default=settings.workers,
+        help="worker processes (0 = one per available core)",
+    )
+    parser.add_argument(
+        "--keep-alive", type=int, default=settings.timeout_keep_alive,
+        help="seconds to keep idle connections open",
+    )
+    parser.add_argument(
+        "--backlog", type=int, default=settings.backlog,
+        help="maximum number of pending connections",
+    )
+    parser.add_argument(
+        "--graceful-timeout", type=int, default=settings.timeout_graceful_shutdown,
+        help="seconds to drain in-flight requests on shutdown",
+    )
+    parser.add_argument("--log-level", default="info")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    workers = args.workers or available_cores()
+    config = uvicorn.Config(
+        "server:app",
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        loop=event_loop(),
+        http=http_protocol(),
+        timeout_keep_alive=args.keep_alive,
+        backlog=args.backlog,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        log_level=args.log_level,
+        proxy_headers=True,
+    )
+    server = uvicorn.Server(config)
+    sock = bind_socket(args.host, args.port, args.backlog)
+    try:
+        if workers > 1:
+            # Each worker runs the app lifespan, so each opens and on SIGTERM
+            # drains and closes its own Mongo pool.
+            Multiprocess(config, target=server.run, sockets=[sock]).run()
+        else:
+            server.run(sockets=[sock])
+    finally:
+        sock.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,9 @@ import logging
 from dotenv import load_dotenv
 from pathlib import Path
 
+from models import parse_subscriber_count
+from ranking import rank_from_timestamp
+
 # Load environment variables
 load_dotenv(Path(__file__).parent / '.env')
 
@@ -160,25 +163,37 @@ async def seed_database():
         mongo_url = os.environ['MONGO_URL']
         client = AsyncIOMotorClient(mongo_url)
         db = client[os.environ['DB_NAME']]
+
+        # Seed one tenant (see tenancy.py); SEED_TENANT picks which
+        default_tenant = os.environ.get('DEFAULT_TENANT', 'default').lower()
+        tenant = os.environ.get('SEED_TENANT', default_tenant).lower()
+        # Documents from before multi-tenant mode belong to the default tenant
+        tenant_filter = {"tenant_id": {"$in": [tenant, None]} if tenant == default_tenant else tenant}
         
         # Clear existing data
-        logger.info("Clearing existing data...")
-        await db.portfolio_items.delete_many({})
-        await db.testimonials.delete_many({})
-        await db.stats.delete_many({})
+        logger.info(f"Clearing existing data of tenant {tenant}...")
+        await db.portfolio_items.delete_many(tenant_filter)
+        await db.testimonials.delete_many(tenant_filter)
+        await db.stats.delete_many(tenant_filter)
         
         # Add IDs to documents
         for item in portfolio_items:
             import uuid
             item["_id"] = str(uuid.uuid4())
+            item["rank"] = rank_from_timestamp(item["created_at"], item["_id"])
+            item["pinned"] = False
+            item["tenant_id"] = tenant
             
         for testimonial in testimonials:
             import uuid
             testimonial["_id"] = str(uuid.uuid4())
+            testimonial["subscriber_count"] = parse_subscriber_count(testimonial["subscribers"])
+            testimonial["tenant_id"] = tenant
             
         for stat in stats:
             import uuid
             stat["_id"] = str(uuid.uuid4())
+            stat["tenant_id"] = tenant
         
         # Insert portfolio items
         logger.info("Seeding portfolio items...")
@@ -1,8 +1,7 @@
 from fastapi import FastAPI, APIRouter
-from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
+from contextlib import asynccontextmanager
+import asyncio
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
@@ -10,22 +9,69 @@ from typing import List
 import uuid
 from datetime import datetime
 
+import counters
+import media
+import migrations
+import repositories
+import snapshots
+import tenancy
+from config import get_settings
+from repositories import get_storage
+from logging_setup import setup_logging, RequestIdMiddleware
+from tracing import setup_tracing, tracer, route_class, TracingMiddleware
+from profiling import ProfilingMiddleware, profiling_enabled
+from backpressure import BackpressureMiddleware
+from resilience import StaleWhileRevalidateMiddleware
+
 # Import the new routes
 from routes import router as content_router
+from health import router as health_router
+
+settings = get_settings()
+
+# Configure logging before anything else logs
+setup_logging(settings)
+logger = logging.getLogger(__name__)
+setup_tracing(settings)
+
 
-ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
+async def warm_up_and_publish():
+    await repositories.warm_up()
+    for tenant in tenancy.tenants():
+        with tenancy.use(tenant):
+            snapshots.schedule_publish()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open storage on startup, start background jobs, close on shutdown"""
+    storage = repositories.open_storage(settings)
+    background_tasks = [asyncio.create_task(warm_up_and_publish())]
+    # Document migrations are Mongo-specific; embedded stores are created current
+    if storage.name == "mongo":
+        if settings.migrations_on_startup:
+            background_tasks.append(asyncio.create_task(migrations.run_pending()))
+        # Learn about migrations completed by other workers or by hand
+        background_tasks.append(asyncio.create_task(migrations.follow_completed()))
+    if settings.counter_reconcile_interval > 0 and not storage.read_only:
+        background_tasks.append(asyncio.create_task(
+            counters.reconcile_periodically(settings.counter_reconcile_interval)
+        ))
+    try:
+        yield
+    finally:
+        for task in background_tasks:
+            task.cancel()
+        media.shutdown()
+        repositories.close_storage()
+        tracer.shutdown()
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Create a router with the /api prefix
-api_router = APIRouter(prefix="/api")
+api_router = APIRouter(prefix="/api", route_class=route_class(settings))
 
 # Legacy models for backwards compatibility
 class StatusCheck(BaseModel):
@@ -45,12 +91,12 @@ async def root():
 async def create_status_check(input: StatusCheckCreate):
     status_dict = input.dict()
     status_obj = StatusCheck(**status_dict)
-    _ = await db.status_checks.insert_one(status_obj.dict())
+    await get_storage().status_checks.insert(status_obj.dict())
     return status_obj
 
 @api_router.get("/status", response_model=List[StatusCheck])
 async def get_status_checks():
-    status_checks = await db.status_checks.find().to_list(1000)
+    status_checks = await get_storage().status_checks.list(1000)
     return [StatusCheck(**status_check) for status_check in status_checks]
 
 # Include the content management routes
@@ -59,21 +105,49 @@ app.include_router(content_router, prefix="/api")
 # Include the main API router
 app.include_router(api_router)
 
+# Liveness/readiness probes live outside /api
+app.include_router(health_router)
+
+# Content-addressed portfolio images, cacheable forever
+Path(settings.media_dir).mkdir(parents=True, exist_ok=True)
+app.mount(settings.media_url_prefix, media.ImmutableStaticFiles(directory=settings.media_dir), name="media")
+
+# Published snapshots; in production nginx or a CDN serves these directly
+if settings.snapshot_dir:
+    Path(settings.snapshot_dir).mkdir(parents=True, exist_ok=True)
+    app.mount(
+        settings.snapshot_url_prefix,
+        snapshots.SnapshotStaticFiles(directory=settings.snapshot_dir),
+        name="snapshots",
+    )
+
+# Innermost: shed load before any handler runs. Shed public reads still get
+# the stale response below, and background revalidation is bounded too.
+app.add_middleware(BackpressureMiddleware, settings=settings)
+
+# Stores and replays exactly what the routes produced
+app.add_middleware(StaleWhileRevalidateMiddleware, max_entries=settings.stale_cache_size)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
+    allow_origins=settings.cors_origins,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "Age", "Warning", "Retry-After"],
 )
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+# Everything inside runs as the request's tenant, routed on the tenant-local path
+if tenancy.enabled():
+    app.add_middleware(tenancy.TenantMiddleware)
+
+# Profiling is opt-in: without a token or sample rate the middleware is not installed
+if profiling_enabled(settings):
+    app.add_middleware(ProfilingMiddleware, settings=settings)
+
+if tracer.enabled:
+    app.add_middleware(TracingMiddleware)
+
+# Outermost, so every log line of a request carries its id
+app.add_middleware(RequestIdMiddleware)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
@@ -0,0 +1,172 @@
+"""
+Static JSON snapshots of the public content
+
+When SNAPSHOT_DIR is set, the public read endpoints (portfolio overall and
+per type, testimonials, stats) are rendered to content-hashed files that
+nginx or a CDN can serve without touching Python. `manifest.json` maps each
+snapshot to its current file and is swapped in atomically after all files
+are written. Writes in routes.py schedule a debounced rebuild. In
+multi-tenant mode each tenant has its own subdirectory.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Set
+
+from starlette.staticfiles import StaticFiles
+
+import tenancy
+from config import get_settings
+from files import atomic_write
+from migrations import upcast
+from models import PortfolioItem, PortfolioType, Stats, Testimonial
+from repositories import get_storage
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+
+_publish_task: Optional[asyncio.Task] = None
+# Tenants whose snapshots are out of date
+_dirty: Set[str] = set()
+
+
+def enabled() -> bool:
+    return bool(get_settings().snapshot_dir)
+
+
+def _subpath() -> str:
+    """Directory of the current tenant's snapshots, relative to SNAPSHOT_DIR"""
+    return tenancy.current_tenant() if tenancy.enabled() else ""
+
+
+def url_prefix() -> str:
+    prefix = get_settings().snapshot_url_prefix
+    return f"{prefix}/{_subpath()}" if _subpath() else prefix
+
+
+def _to_public(document: dict, collection: str) -> dict:
+    document = upcast(collection, dict(document))
+    document["id"] = str(document.pop("_id"))
+    return document
+
+
+def _render(model, collection: str, documents) -> bytes:
+    payload = [model.model_validate(_to_public(doc, collection)).model_dump(mode="json") for doc in documents]
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+def _slug(value: str) -> str:
+    return value.lower().replace(" ", "-")
+
+
+async def build() -> dict:
+    """Query the public content once and render every snapshot body"""
+    storage = get_storage()
+    portfolio = await storage.portfolio.list(active_only=True)
+    testimonials = await storage.testimonials.list(active_only=True)
+    stats = await storage.stats.list()
+
+    # Per-type snapshots keep the overall order, exactly like ?type= does
+    bodies = {"portfolio": _render(PortfolioItem, "portfolio_items", portfolio)}
+    for portfolio_type in PortfolioType:
+        bodies[f"portfolio.{_slug(portfolio_type.value)}"] = _render(
+            PortfolioItem, "portfolio_items", [doc for doc in portfolio if doc.get("type") == portfolio_type.value]
+        )
+    bodies["testimonials"] = _render(Testimonial, "testimonials", testimonials)
+    bodies["stats"] = _render(Stats, "stats", stats)
+    return bodies
+
+
+def write(bodies: dict, directory: str, retention: float) -> dict:
+    """Write hashed snapshot files, then the manifest, then prune old files"""
+    root = Path(directory)
+    root.mkdir(parents=True, exist_ok=True)
+    try:
+        previous = set(json.loads((root / MANIFEST_NAME).read_text())["files"].values())
+    except (OSError, ValueError, KeyError):
+        previous = set()
+    files = {}
+    for name, body in bodies.items():
+        filename = f"{name}.{hashlib.sha256(body).hexdigest()[:16]}.json"
+        path = root / filename
+        if not path.exists():
+            atomic_write(path, body)
+        files[name] = filename
+
+    manifest = {"generated_at": datetime.utcnow().isoformat(), "files": files}
+    atomic_write(root / MANIFEST_NAME, json.dumps(manifest, indent=2).encode())
+
+    # Keep superseded files for a while; clients may still hold an old manifest.
+    # Retention counts from replacement, so files leaving the manifest are
+    # stamped now rather than aged by when they were written.
+    current = set(files.values())
+    for filename in previous - current:
+        try:
+            os.utime(root / filename)
+        except OSError:
+            pass
+    cutoff = time.time() - retention
+    for path in root.glob("*.json"):
+        if path.name != MANIFEST_NAME and path.name not in current and path.stat().st_mtime < cutoff:
+            path.unlink(missing_ok=True)
+    return manifest
+
+
+async def publish() -> dict:
+    settings = get_settings()
+    bodies = await build()
+    directory = os.path.join(settings.snapshot_dir, _subpath())
+    manifest = await asyncio.to_thread(write, bodies, directory, settings.snapshot_retention)
+    logger.info("Published snapshots", extra={"files": len(manifest["files"]), "tenant": tenancy.current_tenant()})
+    return manifest
+
+
+async def _publish_when_quiet() -> None:
+    settings = get_settings()
+    while _dirty:
+        await asyncio.sleep(settings.snapshot_debounce)
+        tenants = list(_dirty)
+        _dirty.clear()
+        for tenant in tenants:
+            with tenancy.use(tenant):
+                try:
+                    await publish()
+                except Exception as e:
+                    logger.error("Error publishing snapshots for %s: %s", tenant, e)
+
+
+def schedule_publish() -> None:
+    """Rebuild the current tenant's snapshots shortly after the current burst of writes"""
+    global _publish_task
+    if not enabled():
+        return
+    _dirty.add(tenancy.current_tenant())
+    if _publish_task is None or _publish_task.done():
+        _publish_task = asyncio.create_task(_publish_when_quiet())
+
+
+async def read_manifest() -> Optional[dict]:
+    path = Path(get_settings().snapshot_dir) / _subpath() / MANIFEST_NAME
+    try:
+        return json.loads(await asyncio.to_thread(path.read_text))
+    except (OSError, ValueError):
+        return None
+
+
+class SnapshotStaticFiles(StaticFiles):
+    """Serve hashed snapshots as immutable and the manifest as always-revalidate"""
+
+    def file_response(self, full_path, *args, **kwargs):
+        response = super().file_response(full_path, *args, **kwargs)
+        if Path(full_path).name == MANIFEST_NAME:
+            response.headers["Cache-Control"] = "no-cache"
+        else:
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
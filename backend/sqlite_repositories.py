@@ -0,0 +1,559 @@
+"""
+Embedded SQLite storage
+
+Each entity is a table of JSON documents (`id`, `doc`) with generated,
+indexed columns for the fields the API filters and sorts on, so queries use
+the same index shapes as database.ensure_indexes(). All SQLite work runs on
+one dedicated thread, which serializes writes and keeps the event loop free.
+Writable files use WAL mode; read-only edge nodes open the file with
+`mode=ro` and pick up a newly exported file on restart. Writable files from
+before multi-tenant mode are upgraded in place on open; read-only files
+exported before it must be exported again.
+
+Export the public content of the Mongo database to a file for an edge node:
+
+    python sqlite_repositories.py export content.db
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from repositories import (
+    InquiryRepository, PortfolioRepository, StatsRepository, StatusCheckRepository,
+    Storage, TestimonialRepository, sort_fields,
+)
+from tenancy import current_tenant, default_tenant, scoped_key
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS portfolio_items (
+    id TEXT PRIMARY KEY,
+    doc TEXT NOT NULL,
+    tenant_id TEXT AS (json_extract(doc, '$.tenant_id')),
+    is_active INTEGER AS (json_extract(doc, '$.is_active')),
+    type TEXT AS (json_extract(doc, '$.type')),
+    pinned INTEGER AS (coalesce(json_extract(doc, '$.pinned'), 0)),
+    rank TEXT AS (json_extract(doc, '$.rank'))
+);
+
+CREATE TABLE IF NOT EXISTS testimonials (
+    id TEXT PRIMARY KEY,
+    doc TEXT NOT NULL,
+    tenant_id TEXT AS (json_extract(doc, '$.tenant_id')),
+    is_active INTEGER AS (json_extract(doc, '$.is_active')),
+    created_at TEXT AS (json_extract(doc, '$.created_at."$date"')),
+    subscriber_count INTEGER AS (json_extract(doc, '$.subscriber_count'))
+);
+
+CREATE TABLE IF NOT EXISTS stats (
+    id TEXT PRIMARY KEY,
+    doc TEXT NOT NULL,
+    tenant_id TEXT AS (json_extract(doc, '$.tenant_id')),
+    "order" INTEGER AS (json_extract(doc, '$.order')),
+    metric TEXT AS (json_extract(doc, '$.metric'))
+);
+
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value NUMERIC NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS contact_inquiries (
+    id TEXT PRIMARY KEY,
+    doc TEXT NOT NULL,
+    tenant_id TEXT AS (json_extract(doc, '$.tenant_id')),
+    status TEXT AS (json_extract(doc, '$.status')),
+    created_at TEXT AS (json_extract(doc, '$.created_at."$date"')),
+    subscriber_count INTEGER AS (json_extract(doc, '$.subscriber_count'))
+);
+
+CREATE TABLE IF NOT EXISTS status_checks (
+    id TEXT PRIMARY KEY,
+    doc TEXT NOT NULL,
+    tenant_id TEXT AS (json_extract(doc, '$.tenant_id')),
+    timestamp TEXT AS (json_extract(doc, '$.timestamp."$date"'))
+);
+"""
+
+# Created after any pre-tenant table has gained its tenant_id column
+INDEXES = """
+DROP INDEX IF EXISTS portfolio_active_type_order;
+DROP INDEX IF EXISTS portfolio_active_order;
+DROP INDEX IF EXISTS portfolio_order;
+DROP INDEX IF EXISTS testimonials_active_created;
+DROP INDEX IF EXISTS testimonials_active_subscribers;
+DROP INDEX IF EXISTS stats_order;
+DROP INDEX IF EXISTS stats_metric;
+DROP INDEX IF EXISTS inquiries_status_created;
+DROP INDEX IF EXISTS inquiries_created;
+DROP INDEX IF EXISTS inquiries_status_subscribers;
+DROP INDEX IF EXISTS inquiries_subscribers;
+DROP INDEX IF EXISTS testimonials_tenant_active_subscribers;
+DROP INDEX IF EXISTS inquiries_tenant_status_subscribers;
+DROP INDEX IF EXISTS inquiries_tenant_subscribers;
+
+CREATE INDEX IF NOT EXISTS portfolio_tenant_active_type_order
+    ON portfolio_items (tenant_id, is_active, type, pinned DESC, rank);
+CREATE INDEX IF NOT EXISTS portfolio_tenant_active_order ON portfolio_items (tenant_id, is_active, pinned DESC, rank);
+CREATE INDEX IF NOT EXISTS portfolio_tenant_order ON portfolio_items (tenant_id, pinned DESC, rank);
+CREATE INDEX IF NOT EXISTS testimonials_tenant_active_created ON testimonials (tenant_id, is_active, created_at DESC);
+CREATE INDEX IF NOT EXISTS testimonials_tenant_active_subscribers_created
+    ON testimonials (tenant_id, is_active, subscriber_count DESC, created_at DESC);
+CREATE INDEX IF NOT EXISTS stats_tenant_order ON stats (tenant_id, "order");
+CREATE INDEX IF NOT EXISTS stats_tenant_metric ON stats (tenant_id, metric);
+CREATE INDEX IF NOT EXISTS inquiries_tenant_status_created ON contact_inquiries (tenant_id, status, created_at DESC);
+CREATE INDEX IF NOT EXISTS inquiries_tenant_created ON contact_inquiries (tenant_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS inquiries_tenant_status_subscribers_created
+    ON contact_inquiries (tenant_id, status, subscriber_count DESC, created_at DESC);
+CREATE INDEX IF NOT EXISTS inquiries_tenant_subscribers_created
+    ON contact_inquiries (tenant_id, subscriber_count DESC, created_at DESC);
+CREATE INDEX IF NOT EXISTS status_checks_tenant_timestamp ON status_checks (tenant_id, timestamp);
+"""
+
+TENANT_TABLES = ("portfolio_items", "testimonials", "stats", "contact_inquiries", "status_checks")
+
+
+def _upgrade_schema(conn: sqlite3.Connection, default_tenant: str) -> None:
+    """Give tables created before multi-tenant mode their tenant_id column"""
+    for table in TENANT_TABLES:
+        columns = {row[1] for row in conn.execute(f"PRAGMA table_xinfo({table})")}
+        if "tenant_id" not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN tenant_id TEXT AS (json_extract(doc, '$.tenant_id'))")
+        conn.execute(
+            f"UPDATE {table} SET doc = json_set(doc, '$.tenant_id', ?) WHERE tenant_id IS NULL", (default_tenant,)
+        )
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    raise TypeError(f"Cannot store {type(value).__name__}")
+
+
+def _decode_object(obj: dict):
+    if len(obj) == 1 and "$date" in obj:
+        return datetime.fromisoformat(obj["$date"])
+    return obj
+
+
+def encode(document: dict) -> str:
+    return json.dumps(document, default=_encode_value, separators=(",", ":"))
+
+
+def decode(text: str) -> dict:
+    return json.loads(text, object_hook=_decode_object)
+
+
+def _order_by(sort: str, order: str) -> str:
+    return ", ".join(
+        f"{column} {'ASC' if direction == 1 else 'DESC'}" for column, direction in sort_fields(sort, order)
+    )
+
+
+def _subscriber_range(clauses: List[str], params: list, min_subscribers, max_subscribers) -> None:
+    if min_subscribers is not None:
+        clauses.append("subscriber_count >= ?")
+        params.append(min_subscribers)
+    if max_subscribers is not None:
+        clauses.append("subscriber_count <= ?")
+        params.append(max_subscribers)
+
+
+def _where(clauses: List[str]) -> str:
+    return f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+
+def _scoped(clauses: Sequence[str] = (), params: Sequence = ()) -> Tuple[str, list]:
+    """WHERE clause and parameters restricted to the current tenant.
+
+    Call it on the event loop: the SQLite thread does not see the request's
+    context variables.
+    """
+    return _where(["tenant_id = ?", *clauses]), [current_tenant(), *params]
+
+
+class _Table:
+    """Document operations shared by every entity table"""
+
+    def __init__(self, storage: "SqliteStorage", name: str):
+        self.storage = storage
+        self.name = name
+
+    def _select(self, conn, where: str = "", params=(), suffix: str = "") -> List[dict]:
+        rows = conn.execute(f"SELECT doc FROM {self.name}{where}{suffix}", params).fetchall()
+        return [decode(row[0]) for row in rows]
+
+    def _get(self, conn, tenant: str, document_id: str) -> Optional[dict]:
+        row = conn.execute(
+            f"SELECT doc FROM {self.name} WHERE tenant_id = ? AND id = ?", (tenant, document_id)
+        ).fetchone()
+        return decode(row[0]) if row else None
+
+    def _put(self, conn, document_id: str, document: dict) -> None:
+        conn.execute(
+            f"INSERT INTO {self.name} (id, doc) VALUES (?, ?) ON CONFLICT (id) DO UPDATE SET doc = excluded.doc",
+            (document_id, encode(document)),
+        )
+
+    async def get(self, document_id: str) -> Optional[dict]:
+        return await self.storage.run(self._get, current_tenant(), document_id)
+
+    async def get_many(self, ids: List[str]) -> List[dict]:
+        ids = list(ids)
+        if not ids:
+            return []
+        where, params = _scoped([f"id IN ({','.join('?' * len(ids))})"], ids)
+        return await self.storage.run(self._select, where, params)
+
+    async def insert(self, document: dict) -> dict:
+        document["tenant_id"] = current_tenant()
+
+        def insert(conn):
+            conn.execute(f"INSERT INTO {self.name} (id, doc) VALUES (?, ?)", (document["_id"], encode(document)))
+        await self.storage.write(insert)
+        return document
+
+    async def update(self, document_id: str, fields: dict) -> Optional[dict]:
+        tenant = current_tenant()
+
+        def update(conn):
+            previous = self._get(conn, tenant, document_id)
+            if previous is not None:
+                self._put(conn, document_id, {**previous, **fields})
+            return previous
+        return await self.storage.write(update)
+
+    async def delete(self, document_id: str) -> Optional[dict]:
+        tenant = current_tenant()
+
+        def delete(conn):
+            previous = self._get(conn, tenant, document_id)
+            if previous is not None:
+                conn.execute(f"DELETE FROM {self.name} WHERE id = ?", (document_id,))
+            return previous
+        return await self.storage.write(delete)
+
+    async def count(self, clauses: Sequence[str] = (), params: Sequence = ()) -> int:
+        where, params = _scoped(clauses, params)
+
+        def count(conn):
+            return conn.execute(f"SELECT count(*) FROM {self.name}{where}", params).fetchone()[0]
+        return await self.storage.run(count)
+
+
+class SqlitePortfolioRepository(_Table, PortfolioRepository):
+    def __init__(self, storage):
+        super().__init__(storage, "portfolio_items")
+
+    async def list(self, active_only, type_filter=None):
+        clauses, params = [], []
+        if active_only:
+            clauses.append("is_active = 1")
+        if type_filter:
+            clauses.append("type = ?")
+            params.append(type_filter)
+        where, params = _scoped(clauses, params)
+        return await self.storage.run(self._select, where, params, " ORDER BY pinned DESC, rank ASC LIMIT 1000")
+
+    async def adjacent_rank(self, pinned, exclude_id=None, above=None, below=None):
+        clauses = ["pinned = 1" if pinned else "pinned = 0", "rank IS NOT NULL"]
+        params = []
+        if exclude_id is not None:
+            clauses.append("id != ?")
+            params.append(exclude_id)
+        direction = "ASC"
+        if above is not None:
+            clauses.append("rank > ?")
+            params.append(above)
+        elif below is not None:
+            clauses.append("rank < ?")
+            params.append(below)
+            direction = "DESC"
+        where, params = _scoped(clauses, params)
+
+        def adjacent(conn):
+            row = conn.execute(
+                f"SELECT rank FROM portfolio_items{where} ORDER BY rank {direction} LIMIT 1", params
+            ).fetchone()
+            return row[0] if row else None
+        return await self.storage.run(adjacent)
+
+    async def count_active(self):
+        return await self.count(["is_active = 1"])
+
+
+class SqliteTestimonialRepository(_Table, TestimonialRepository):
+    def __init__(self, storage):
+        super().__init__(storage, "testimonials")
+
+    async def list(self, active_only, min_subscribers=None, max_subscribers=None, sort="created_at", order="desc"):
+        clauses, params = [], []
+        if active_only:
+            clauses.append("is_active = 1")
+        _subscriber_range(clauses, params, min_subscribers, max_subscribers)
+        where, params = _scoped(clauses, params)
+        return await self.storage.run(
+            self._select, where, params, f" ORDER BY {_order_by(sort, order)} LIMIT 1000"
+        )
+
+    async def rating_summary(self):
+        where, params = _scoped(["is_active = 1"])
+
+        def summary(conn):
+            count, total = conn.execute(
+                f"SELECT count(*), coalesce(sum(json_extract(doc, '$.rating')), 0) FROM testimonials{where}", params
+            ).fetchone()
+            return count, total
+        return await self.storage.run(summary)
+
+
+class SqliteStatsRepository(_Table, StatsRepository):
+    def __init__(self, storage):
+        super().__init__(storage, "stats")
+
+    async def list(self):
+        where, params = _scoped()
+        return await self.storage.run(self._select, where, params, ' ORDER BY "order" ASC LIMIT 1000')
+
+    async def set_metric_number(self, metric, number, updated_at):
+        where, params = _scoped(["metric = ?"], [metric])
+
+        def set_number(conn):
+            for document in self._select(conn, where, params):
+                document["number"] = number + (document.get("suffix") or "")
+                document["updated_at"] = updated_at
+                self._put(conn, document["_id"], document)
+        await self.storage.write(set_number)
+
+    # Counters are shared rows; names are made per tenant with scoped_key()
+    async def increment_counter(self, name, delta):
+        key = scoped_key(name)
+
+        def increment(conn):
+            return conn.execute(
+                "INSERT INTO counters (name, value) VALUES (?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value RETURNING value",
+                (key, delta),
+            ).fetchone()[0]
+        return await self.storage.write(increment)
+
+    async def get_counters(self, names):
+        keys = {scoped_key(name): name for name in names}
+
+        def get(conn):
+            placeholders = ",".join("?" * len(keys))
+            rows = conn.execute(f"SELECT name, value FROM counters WHERE name IN ({placeholders})", list(keys))
+            return {keys[key]: value for key, value in rows}
+        return await self.storage.run(get) if keys else {}
+
+    async def set_counters(self, values):
+        rows = [(scoped_key(name), value) for name, value in values.items()]
+
+        def set_values(conn):
+            conn.executemany(
+                "INSERT INTO counters (name, value) VALUES (?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET value = excluded.value",
+                rows,
+            )
+        await self.storage.write(set_values)
+
+
+class SqliteInquiryRepository(_Table, InquiryRepository):
+    def __init__(self, storage):
+        super().__init__(storage, "contact_inquiries")
+
+    async def list(self, status=None, min_subscribers=None, max_subscribers=None,
+                   sort="created_at", order="desc", limit=50):
+        clauses, params = [], []
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        _subscriber_range(clauses, params, min_subscribers, max_subscribers)
+        where, params = _scoped(clauses, params)
+        return await self.storage.run(
+            self._select, where, params + [limit], f" ORDER BY {_order_by(sort, order)} LIMIT ?"
+        )
+
+    async def update(self, document_id, fields, statuses=None):
+        if statuses is None:
+            return await super().update(document_id, fields)
+        tenant = current_tenant()
+
+        def update(conn):
+            # Checked and written on the single writer thread, so nothing interleaves
+            previous = self._get(conn, tenant, document_id)
+            if previous is None or previous.get("status") not in statuses:
+                return None
+            self._put(conn, document_id, {**previous, **fields})
+            return previous
+        return await self.storage.write(update)
+
+    async def update_many(self, fields, ids=None, statuses=None, created_before=None):
+        clauses, params = [], []
+        for column, values in (("id", ids), ("status", statuses)):
+            if values is not None:
+                values = list(values) or [None]
+                clauses.append(f"{column} IN ({','.join('?' * len(values))})")
+                params.extend(values)
+        if created_before is not None:
+            clauses.append("created_at < ?")
+            params.append(created_before.isoformat())
+        where, params = _scoped(clauses, params)
+
+        def update(conn):
+            # json_patch merges the encoded fields into each document in place
+            cursor = conn.execute(
+                f"UPDATE contact_inquiries SET doc = json_patch(doc, ?){where}",
+                [encode(fields)] + params,
+            )
+            return cursor.rowcount, cursor.rowcount
+        return await self.storage.write(update)
+
+    async def count(self, status=None):
+        if status:
+            return await super().count(["status = ?"], [status])
+        return await super().count()
+
+
+class SqliteStatusCheckRepository(_Table, StatusCheckRepository):
+    def __init__(self, storage):
+        super().__init__(storage, "status_checks")
+
+    async def list(self, limit=1000):
+        where, params = _scoped()
+        return await self.storage.run(self._select, where, params + [limit], " ORDER BY timestamp LIMIT ?")
+
+    async def insert(self, document):
+        document["tenant_id"] = current_tenant()
+
+        def insert(conn):
+            conn.execute("INSERT INTO status_checks (id, doc) VALUES (?, ?)", (document["id"], encode(document)))
+        await self.storage.write(insert)
+        return document
+
+
+class SqliteStorage(Storage):
+    name = "sqlite"
+    # "database is locked" and I/O errors
+    transient_errors = (sqlite3.OperationalError,)
+
+    def __init__(self, path: str, read_only: bool = False):
+        self.path = path
+        self.read_only = read_only
+        # Read here: the SQLite thread never sees the request's tenant
+        self.default_tenant = default_tenant()
+        # One thread owns the connection; SQLite objects never cross threads
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self._conn: Optional[sqlite3.Connection] = None
+        self.portfolio = SqlitePortfolioRepository(self)
+        self.testimonials = SqliteTestimonialRepository(self)
+        self.stats = SqliteStatsRepository(self)
+        self.inquiries = SqliteInquiryRepository(self)
+        self.status_checks = SqliteStatusCheckRepository(self)
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.read_only:
+                conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+                columns = {row[1] for row in conn.execute("PRAGMA table_xinfo(portfolio_items)")}
+                if "tenant_id" not in columns:
+                    conn.close()
+                    raise RuntimeError(f"{self.path} predates multi-tenant mode; export it again")
+            else:
+                conn = sqlite3.connect(self.path)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.executescript(SCHEMA)
+                with conn:
+                    _upgrade_schema(conn, self.default_tenant)
+                conn.executescript(INDEXES)
+            self._conn = conn
+        return self._conn
+
+    async def run(self, fn: Callable, *args):
+        """Run fn(connection, *args) on the SQLite thread"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: fn(self._connection(), *args))
+
+    async def write(self, fn: Callable):
+        """Run fn(connection) in a transaction on the SQLite thread"""
+        if self.read_only:
+            raise PermissionError("Storage is read-only")
+
+        def transaction(conn):
+            with conn:
+                return fn(conn)
+        return await self.run(transaction)
+
+    async def ping(self) -> bool:
+        await self.run(lambda conn: conn.execute("SELECT 1").fetchone())
+        return True
+
+    async def prepare(self) -> None:
+        await self.run(lambda conn: conn.execute("ANALYZE") if not self.read_only else None)
+
+    def close(self) -> None:
+        def close_connection():
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        self._executor.submit(close_connection).result()
+        self._executor.shutdown(wait=True)
+
+
+async def export_from_mongo(path: str) -> Dict[str, int]:
+    """Copy the public content and counters from Mongo into a fresh SQLite file.
+
+    Contact inquiries hold personal data and are not exported. Every tenant
+    is copied, with pending document migrations applied. The file is built
+    next to path and swapped in atomically.
+    """
+    from database import get_db
+    from migrations import upcast
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    for leftover in (tmp, f"{tmp}-wal", f"{tmp}-shm"):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    target = SqliteStorage(tmp)
+    db = get_db()
+    copied = {}
+    try:
+        for name in ("portfolio_items", "testimonials", "stats"):
+            documents = [upcast(name, doc) for doc in await db[name].find({}).to_list(None)]
+            table = _Table(target, name)
+            await target.write(lambda conn: [table._put(conn, doc["_id"], doc) for doc in documents])
+            copied[name] = len(documents)
+        # Default tenant names are unprefixed, so stored names are copied as-is
+        counters = {c["_id"]: c["value"] async for c in db.counters.find({})}
+        await target.stats.set_counters(counters)
+        copied["counters"] = len(counters)
+        # Fold the WAL back into the main file so it can be copied as one file
+        await target.run(lambda conn: conn.execute("PRAGMA wal_checkpoint(TRUNCATE)"))
+        await target.run(lambda conn: conn.execute("PRAGMA journal_mode=DELETE"))
+    finally:
+        target.close()
+    os.replace(tmp, path)
+    return copied
+
+
+if __name__ == "__main__":
+    import sys
+
+    import database
+
+    if len(sys.argv) != 3 or sys.argv[1] != "export":
+        sys.exit("usage: python sqlite_repositories.py export <path>")
+
+    async def main() -> None:
+        database.connect()
+        try:
+            print(await export_from_mongo(sys.argv[2]))
+        finally:
+            database.close()
+
+    asyncio.run(main())
@@ -0,0 +1,134 @@
+"""
+Multi-tenant mode
+
+One deployment can serve several sites from the shared collections. Every
+document carries a `tenant_id`, every repository query is restricted to the
+current tenant (see repositories.py), and the compound indexes lead with
+`tenant_id`. Caches, stale responses, snapshots and backpressure limits are
+kept per tenant as well.
+
+TENANT_MODE selects how a request's tenant is resolved:
+
+- `off` (default): everything belongs to DEFAULT_TENANT
+- `host`: by Host header, from the hosts listed in TENANTS
+  (`acme:acme.com|www.acme.com,beta:beta.io`); unknown hosts get
+  DEFAULT_TENANT, so probes against a pod address keep working
+- `path`: by prefix, `/t/acme/api/...` is served as `/api/...` for tenant
+  `acme`; paths without the prefix belong to DEFAULT_TENANT
+
+Background jobs run once per tenant inside `use(tenant)`.
+"""
+
+import json
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+
+from config import get_settings
+
+tenant_var: ContextVar[Optional[str]] = ContextVar("tenant", default=None)
+
+
+def enabled() -> bool:
+    return get_settings().tenant_mode != "off"
+
+
+def default_tenant() -> str:
+    return get_settings().default_tenant
+
+
+def current_tenant() -> str:
+    return tenant_var.get() or get_settings().default_tenant
+
+
+def tenants() -> List[str]:
+    """Every tenant background jobs should run for, the default one first"""
+    settings = get_settings()
+    if not enabled():
+        return [settings.default_tenant]
+    return list(dict.fromkeys([settings.default_tenant, *settings.tenants]))
+
+
+@contextmanager
+def use(tenant: str) -> Iterator[None]:
+    token = tenant_var.set(tenant)
+    try:
+        yield
+    finally:
+        tenant_var.reset(token)
+
+
+def scoped_key(key: str) -> str:
+    """Key of a per-tenant record in a shared keyspace such as the counters.
+
+    The default tenant keeps the bare key, so single-tenant data stays valid.
+    """
+    tenant = current_tenant()
+    return key if tenant == default_tenant() else f"{tenant}:{key}"
+
+
+class TenantMiddleware:
+    """Resolve the tenant of each request and make it current while it runs"""
+
+    def __init__(self, app):
+        self.app = app
+        settings = get_settings()
+        self.mode = settings.tenant_mode
+        if self.mode not in ("host", "path"):
+            raise ValueError(f"Unknown TENANT_MODE {self.mode!r}")
+        self.default = settings.default_tenant
+        self.prefix = settings.tenant_path_prefix
+        self.tenants = set(tenants())
+        self.hosts: Dict[str, str] = {
+            host: tenant for tenant, hosts in settings.tenants.items() for host in hosts
+        }
+
+    def _from_host(self, scope) -> str:
+        for name, value in scope["headers"]:
+            if name == b"host":
+                host = value.decode("latin-1").lower()
+                # Drop the port, minding bracketed IPv6 literals
+                if host.rfind(":") > host.rfind("]"):
+                    host = host.rpartition(":")[0]
+                return self.hosts.get(host, self.default)
+        return self.default
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if self.mode == "host":
+            tenant = self._from_host(scope)
+        else:
+            tenant = self.default
+            path = scope["path"]
+            if path.startswith(self.prefix + "/"):
+                tenant, _, rest = path[len(self.prefix) + 1:].partition("/")
+                if tenant not in self.tenants:
+                    await self._not_found(send)
+                    return
+                # Route as if mounted: the prefix moves into root_path
+                mount = f"{self.prefix}/{tenant}"
+                scope = dict(scope)
+                scope["path"] = "/" + rest
+                raw_path = scope.get("raw_path")
+                if raw_path and raw_path.startswith(mount.encode()):
+                    scope["raw_path"] = raw_path[len(mount):] or b"/"
+                scope["root_path"] = scope.get("root_path", "") + mount
+
+        token = tenant_var.set(tenant)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            tenant_var.reset(token)
+
+    @staticmethod
+    async def _not_found(send) -> None:
+        body = json.dumps({"detail": "Unknown tenant"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 404,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
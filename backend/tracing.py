@@ -0,0 +1,483 @@
+#!/usr/bin/env python3
+"""
+Lightweight request tracing
+
+One span per HTTP request, with child spans for the route handler, response
+model validation, JSON rendering and every Mongo command (via a pymongo
+CommandListener). W3C `traceparent` headers are honoured on the way in and
+returned on the way out. Finished spans are batched on a background thread
+and exported to a JSON-lines file or an OTLP/HTTP (JSON) collector.
+
+Running this module starts a stand-in OTLP collector that appends received
+spans to a file:
+    python tracing.py --port 4318 --out traces.jsonl
+"""
+
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import lru_cache, wraps
+from typing import Dict, List, Optional
+
+from fastapi.datastructures import Default, DefaultPlaceholder
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from pymongo import monitoring
+
+from config import Settings
+
+logger = logging.getLogger(__name__)
+
+current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+# Started when the handler returns, ended when the response starts rendering
+# or, failing that, when the route handler finishes
+_validation_span: ContextVar[Optional["Span"]] = ContextVar("validation_span", default=None)
+
+
+def _new_id(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str = field(default_factory=lambda: _new_id(8))
+    parent_id: Optional[str] = None
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: Optional[int] = None
+    attributes: Dict[str, object] = field(default_factory=dict)
+    error: bool = False
+
+    def end(self) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            tracer.export(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": (self.end_ns - self.start_ns) / 1e6,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class FileExporter:
+    """Append spans as JSON lines to a local file"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: List[Span]) -> None:
+        with open(self.path, "a") as out:
+            for span in spans:
+                out.write(json.dumps(span.to_dict(), default=str) + "\n")
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OtlpHttpExporter:
+    """POST spans to an OTLP/HTTP collector using the JSON encoding"""
+
+    def __init__(self, endpoint: str, service_name: str):
+        self.endpoint = endpoint.rstrip("/") + "/v1/traces"
+        self.resource = {
+            "attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]
+        }
+
+    def export(self, spans: List[Span]) -> None:
+        payload = {
+            "resourceSpans": [{
+                "resource": self.resource,
+                "scopeSpans": [{
+                    "scope": {"name": "contentcraft"},
+                    "spans": [
+                        {
+                            "traceId": span.trace_id,
+                            "spanId": span.span_id,
+                            "parentSpanId": span.parent_id or "",
+                            "name": span.name,
+                            "kind": 2 if span.parent_id is None else 1,
+                            "startTimeUnixNano": str(span.start_ns),
+                            "endTimeUnixNano": str(span.end_ns),
+                            "attributes": [
+                                {"key": key, "value": _otlp_value(value)}
+                                for key, value in span.attributes.items()
+                            ],
+                            "status": {"code": 2 if span.error else 1},
+                        }
+                        for span in spans
+                    ],
+                }],
+            }]
+        }
+        request = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(payload).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        urllib.request.urlopen(request, timeout=5).close()
+
+
+class Tracer:
+    """Creates spans and hands finished ones to a background export thread"""
+
+    def __init__(self):
+        self.enabled = False
+        self.sample_rate = 0.0
+        self._exporter = None
+        self._queue: queue.Queue = queue.Queue(maxsize=10000)
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._batch_size = 512
+        self._flush_interval = 1.0
+
+    def configure(self, settings: Settings) -> None:
+        if settings.trace_exporter == "file":
+            self._exporter = FileExporter(settings.trace_file)
+        elif settings.trace_exporter == "otlp":
+            self._exporter = OtlpHttpExporter(settings.trace_otlp_endpoint, settings.trace_service_name)
+        else:
+            self._exporter = None
+        self.enabled = self._exporter is not None
+        self.sample_rate = settings.trace_sample_rate
+        if self.enabled:
+            self._start()
+
+    def _start(self) -> None:
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+            self._thread.start()
+
+    def should_sample(self) -> bool:
+        return self.enabled and random.random() < self.sample_rate
+
+    def start_span(self, name: str, parent: Optional[Span] = None, **attributes) -> Optional[Span]:
+        """Start a child of parent (default: the current span); None when not tracing"""
+        parent = parent or current_span.get()
+        if parent is None:
+            return None
+        return Span(name=name, trace_id=parent.trace_id, parent_id=parent.span_id, attributes=attributes)
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Run the block inside a child span of the current span"""
+        span = self.start_span(name, **attributes)
+        if span is None:
+            yield None
+            return
+        token = current_span.set(span)
+        try:
+            yield span
+        except BaseException:
+            span.error = True
+            raise
+        finally:
+            current_span.reset(token)
+            span.end()
+
+    def export(self, span: Span) -> None:
+        # Restarts the exporter after a shutdown (e.g. a second app lifespan)
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            pass
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            # None is the wake-up sent by shutdown()
+            span = self._queue.get()
+            batch = [] if span is None else [span]
+            deadline = time.monotonic() + self._flush_interval
+            while len(batch) < self._batch_size and not self._stop.is_set():
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    span = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if span is not None:
+                    batch.append(span)
+            if batch:
+                self._flush(batch)
+
+        # Export whatever was queued before shutdown
+        batch = []
+        while True:
+            try:
+                span = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if span is not None:
+                batch.append(span)
+        if batch:
+            self._flush(batch)
+
+    def _flush(self, batch: List[Span]) -> None:
+        try:
+            self._exporter.export(batch)
+        except Exception as e:
+            logger.warning("Dropped %s spans: %s", len(batch), e)
+
+    def shutdown(self, timeout: float = 10.0) -> None:
+        """Stop the export thread once it has exported every finished span"""
+        thread = self._thread
+        if thread is None:
+            return
+        self._stop.set()
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            # The thread is busy draining and will see the stop flag
+            pass
+        thread.join(timeout)
+        self._thread = None
+
+
+tracer = Tracer()
+
+
+def setup_tracing(settings: Settings) -> None:
+    tracer.configure(settings)
+
+
+def parse_traceparent(value: str):
+    """Return (trace_id, parent_span_id, sampled) from a W3C traceparent header"""
+    parts = value.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        sampled = bool(int(parts[3], 16) & 1)
+    except ValueError:
+        return None
+    return parts[1], parts[2], sampled
+
+
+class TracingMiddleware:
+    """Open a root span per HTTP request and propagate traceparent"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        incoming = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                incoming = parse_traceparent(value.decode("latin-1"))
+                break
+
+        if incoming is not None:
+            trace_id, parent_id, sampled = incoming
+        else:
+            trace_id, parent_id, sampled = _new_id(16), None, tracer.should_sample()
+
+        if not sampled:
+            await self.app(scope, receive, send)
+            return
+
+        span = Span(
+            name=f"{scope['method']} {scope['path']}",
+            trace_id=trace_id,
+            parent_id=parent_id,
+            attributes={"http.method": scope["method"], "http.target": scope["path"]},
+        )
+        traceparent = f"00-{trace_id}-{span.span_id}-01".encode()
+
+        async def send_with_traceparent(message):
+            if message["type"] == "http.response.start":
+                span.attributes["http.status_code"] = message["status"]
+                span.error = message["status"] >= 500
+                message["headers"] = list(message.get("headers", [])) + [(b"traceparent", traceparent)]
+            await send(message)
+
+        token = current_span.set(span)
+        try:
+            await self.app(scope, receive, send_with_traceparent)
+        except BaseException:
+            span.error = True
+            raise
+        finally:
+            route = scope.get("route")
+            if route is not None:
+                span.name = f"{scope['method']} {route.path}"
+                span.attributes["http.route"] = route.path
+            current_span.reset(token)
+            span.end()
+
+
+@lru_cache()
+def _traced_response_class(base):
+    """Subclass base so rendering closes the validation span and records its own"""
+    if getattr(base, "_traced", False):
+        return base
+
+    class TracedResponse(base):
+        _traced = True
+
+        def render(self, content) -> bytes:
+            validation = _validation_span.get()
+            if validation is not None:
+                validation.end()
+                _validation_span.set(None)
+            with tracer.span("response.render"):
+                return super().render(content)
+
+    TracedResponse.__name__ = f"Traced{base.__name__}"
+    return TracedResponse
+
+
+class TracedRoute(APIRoute):
+    """APIRoute recording handler, response validation and rendering spans"""
+
+    def __init__(self, path: str, endpoint, *, response_class=Default(JSONResponse), **kwargs):
+        base = response_class.value if isinstance(response_class, DefaultPlaceholder) else response_class
+        super().__init__(
+            path,
+            self._wrap_endpoint(endpoint),
+            response_class=_traced_response_class(base),
+            **kwargs,
+        )
+
+    @staticmethod
+    def _wrap_endpoint(endpoint):
+        # include_router re-creates routes from the already wrapped endpoint
+        if getattr(endpoint, "_traced", False):
+            return endpoint
+
+        @wraps(endpoint)
+        async def traced_endpoint(*args, **kwargs):
+            with tracer.span(f"handler {endpoint.__name__}"):
+                result = await endpoint(*args, **kwargs)
+            _validation_span.set(tracer.start_span("response.validate"))
+            return result
+
+        traced_endpoint._traced = True
+        return traced_endpoint
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def traced_handler(request):
+            # Rendering normally ends the validation span; close it here when
+            # validation fails or the handler returned a Response itself
+            token = _validation_span.set(None)
+            try:
+                return await handler(request)
+            except BaseException:
+                validation = _validation_span.get()
+                if validation is not None:
+                    validation.error = True
+                raise
+            finally:
+                validation = _validation_span.get()
+                if validation is not None:
+                    validation.end()
+                _validation_span.reset(token)
+
+        return traced_handler
+
+
+def route_class(settings: Settings):
+    """Route class for APIRouters: traced only when an exporter is configured"""
+    return TracedRoute if settings.trace_exporter in ("file", "otlp") else APIRoute
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Record a span for every Mongo command issued inside a traced request"""
+
+    def __init__(self):
+        self._spans: Dict[tuple, Span] = {}
+
+    def started(self, event) -> None:
+        span = tracer.start_span(
+            f"mongo.{event.command_name}",
+            **{
+                "db.system": "mongodb",
+                "db.name": event.database_name,
+                "db.operation": event.command_name,
+                "db.collection": str(event.command.get(event.command_name, "")),
+            },
+        )
+        if span is not None:
+            self._spans[(event.request_id, event.connection_id)] = span
+
+    def succeeded(self, event) -> None:
+        span = self._spans.pop((event.request_id, event.connection_id), None)
+        if span is not None:
+            span.end()
+
+    def failed(self, event) -> None:
+        span = self._spans.pop((event.request_id, event.connection_id), None)
+        if span is not None:
+            span.error = True
+            span.attributes["db.failure"] = str(event.failure)
+            span.end()
+
+
+def mongo_event_listeners(settings: Settings) -> list:
+    return [MongoCommandListener()] if settings.trace_exporter in ("file", "otlp") else []
+
+
+def _serve_collector(port: int, out: str) -> None:
+    """Minimal OTLP/HTTP JSON receiver that appends spans to a file"""
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    class Receiver(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            payload = json.loads(body or b"{}")
+            with open(out, "a") as sink:
+                for resource_spans in payload.get("resourceSpans", []):
+                    for scope_spans in resource_spans.get("scopeSpans", []):
+                        for span in scope_spans.get("spans", []):
+                            sink.write(json.dumps(span) + "\n")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, format, *args):
+            pass
+
+    print(f"Collecting OTLP spans on :{port} into {out}")
+    HTTPServer(("0.0.0.0", port), Receiver).serve_forever()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Stand-in OTLP/HTTP collector")
+    parser.add_argument("--port", type=int, default=4318)
+    parser.add_argument("--out", default="traces.jsonl")
+    args = parser.parse_args()
+    _serve_collector(args.port, args.out)
@@ -23,6 +23,28 @@ export const api = {
     }
   },
 
+  getPortfolioItem: async (id) => {
+    try {
+      const response = await axios.get(`${API}/portfolio/${encodeURIComponent(id)}`);
+      return response.data;
+    } catch (error) {
+      console.error('Error fetching portfolio item:', error);
+      throw error;
+    }
+  },
+
+  // Returns { items, missing } with items in the order of ids (null for misses)
+  lookupPortfolioItems: async (ids) => {
+    try {
+      const params = new URLSearchParams({ ids: ids.join(',') });
+      const response = await axios.get(`${API}/portfolio/lookup?${params.toString()}`);
+      return response.data;
+    } catch (error) {
+      console.error('Error looking up portfolio items:', error);
+      throw error;
+    }
+  },
+
   // Testimonials API
   getTestimonials: async (active = true) => {
     try {
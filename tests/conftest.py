@@ -0,0 +1,38 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# The backend modules import each other as top-level modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+# Tests run on the embedded store; nothing here may reach a real database
+os.environ.setdefault("STORAGE_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_PATH", ":memory:")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("WARMUP_ON_STARTUP", "false")
+os.environ.setdefault("COUNTER_RECONCILE_INTERVAL", "0")
+os.environ.setdefault("MEDIA_DIR", tempfile.mkdtemp(prefix="media-"))
+
+
+@pytest.fixture(params=["sqlite", "mongo"])
+def storage(request, monkeypatch):
+    """Each storage backend, unguarded and empty"""
+    import database
+    import mongo_repositories
+    from sqlite_repositories import SqliteStorage
+
+    if request.param == "sqlite":
+        storage = SqliteStorage(":memory:")
+    else:
+        mongomock_motor = pytest.importorskip("mongomock_motor")
+        client = mongomock_motor.AsyncMongoMockClient()
+        db = client["test"]
+        monkeypatch.setattr(database, "_client", client)
+        monkeypatch.setattr(database, "get_db", lambda: db)
+        monkeypatch.setattr(mongo_repositories, "get_db", lambda: db)
+        storage = mongo_repositories.MongoStorage()
+    yield storage
+    storage.close()
@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+from backpressure import Bulkhead, Rejected
+
+
+def test_acquire_and_release():
+    async def scenario():
+        bulkhead = Bulkhead(limit=2, max_queue=0, timeout=1.0)
+        await bulkhead.acquire()
+        await bulkhead.acquire()
+        assert bulkhead.in_flight == 2
+        bulkhead.release()
+        bulkhead.release()
+        assert bulkhead.in_flight == 0
+        assert bulkhead.admitted == 2
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_rejects():
+    async def scenario():
+        bulkhead = Bulkhead(limit=1, max_queue=0, timeout=1.0)
+        await bulkhead.acquire()
+        with pytest.raises(Rejected) as rejected:
+            await bulkhead.acquire()
+        assert rejected.value.retry_after == 1.0
+        assert bulkhead.rejected_queue_full == 1
+
+    asyncio.run(scenario())
+
+
+def test_release_hands_the_slot_to_the_next_waiter():
+    async def scenario():
+        bulkhead = Bulkhead(limit=1, max_queue=1, timeout=1.0)
+        await bulkhead.acquire()
+        waiter = asyncio.create_task(bulkhead.acquire())
+        await asyncio.sleep(0)
+        assert bulkhead.metrics()["queued"] == 1
+        bulkhead.release()
+        await waiter
+        assert bulkhead.in_flight == 1
+        assert bulkhead.metrics()["queued"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_queue_wait_times_out():
+    async def scenario():
+        bulkhead = Bulkhead(limit=1, max_queue=1, timeout=10.0)
+        await bulkhead.acquire()
+        with pytest.raises(Rejected):
+            await bulkhead.acquire(timeout=0.01)
+        assert bulkhead.rejected_timeout == 1
+        assert bulkhead.metrics()["queued"] == 0
+        # The timed out waiter does not get the slot
+        bulkhead.release()
+        assert bulkhead.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        bulkhead = Bulkhead(limit=1, max_queue=1, timeout=10.0)
+        await bulkhead.acquire()
+        waiter = asyncio.create_task(bulkhead.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert bulkhead.metrics()["queued"] == 0
+        bulkhead.release()
+        assert bulkhead.in_flight == 0
+
+    asyncio.run(scenario())
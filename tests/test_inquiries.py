@@ -0,0 +1,123 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+
+
+@pytest.fixture
+def client():
+    with TestClient(server.app) as client:
+        yield client
+
+
+def submit(client, **fields):
+    inquiry = {"name": "Ann", "email": "ann@example.com", "service": "scripts", "message": "Hi", **fields}
+    response = client.post("/api/contact", json=inquiry)
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def set_status(client, inquiry_id, status):
+    response = client.put(f"/api/contact/{inquiry_id}/status", json={"status": status})
+    assert response.status_code == 200
+
+
+def statuses(client):
+    return {inquiry["id"]: inquiry["status"] for inquiry in client.get("/api/contact").json()}
+
+
+def test_bulk_by_ids_skips_disallowed_transitions(client):
+    new = submit(client)
+    contacted = submit(client)
+    set_status(client, contacted, "contacted")
+
+    response = client.put("/api/contact/status", json={"status": "completed", "ids": [new, contacted, "missing"]})
+
+    assert response.status_code == 200
+    assert response.json() == {"matched": 1, "modified": 1, "skipped": [new], "missing": ["missing"]}
+    assert statuses(client) == {new: "new", contacted: "completed"}
+
+
+def test_bulk_by_filter_moves_only_allowed_sources(client):
+    new = submit(client)
+    completed = submit(client)
+    set_status(client, completed, "contacted")
+    set_status(client, completed, "completed")
+
+    response = client.put("/api/contact/status", json={"status": "in-progress", "filter": {"status": "new"}})
+
+    assert response.json()["modified"] == 1
+    assert statuses(client) == {new: "in-progress", completed: "completed"}
+
+
+def test_bulk_by_filter_rejects_disallowed_transition(client):
+    submit(client)
+
+    response = client.put("/api/contact/status", json={"status": "completed", "filter": {"status": "new"}})
+
+    assert response.status_code == 409
+
+
+def test_bulk_requires_ids_or_filter(client):
+    assert client.put("/api/contact/status", json={"status": "closed"}).status_code == 422
+    response = client.put("/api/contact/status", json={"status": "closed", "ids": ["a"], "filter": {"status": "new"}})
+    assert response.status_code == 422
+
+
+def test_bulk_rejects_empty_filter(client):
+    inquiry_id = submit(client)
+
+    response = client.put("/api/contact/status", json={"status": "closed", "filter": {}})
+
+    assert response.status_code == 422
+    assert statuses(client) == {inquiry_id: "new"}
+
+
+def test_bulk_by_created_before(client):
+    inquiry_id = submit(client)
+
+    response = client.put(
+        "/api/contact/status", json={"status": "closed", "filter": {"created_before": "2999-01-01T00:00:00Z"}},
+    )
+
+    assert response.json()["modified"] == 1
+    assert statuses(client) == {inquiry_id: "closed"}
+
+
+def test_single_update_rejects_disallowed_transition(client):
+    inquiry_id = submit(client)
+
+    response = client.put(f"/api/contact/{inquiry_id}/status", json={"status": "completed"})
+
+    assert response.status_code == 409
+
+
+def test_single_update_to_the_same_status(client):
+    inquiry_id = submit(client)
+
+    assert client.put(f"/api/contact/{inquiry_id}/status", json={"status": "new"}).status_code == 200
+
+
+def test_single_update_of_unknown_inquiry(client):
+    assert client.put("/api/contact/missing/status", json={"status": "closed"}).status_code == 404
+
+
+def test_conditional_update_checks_the_stored_status(storage):
+    inquiry = {"_id": "i", "name": "Ann", "status": "completed", "created_at": datetime(2024, 1, 1)}
+
+    async def scenario():
+        await storage.prepare()
+        await storage.inquiries.insert(dict(inquiry))
+        # What a request that read the inquiry as "contacted" would send
+        skipped = await storage.inquiries.update("i", {"status": "in-progress"}, statuses=["new", "contacted"])
+        previous = await storage.inquiries.update("i", {"status": "closed"}, statuses=["completed"])
+        return skipped, previous, await storage.inquiries.get("i")
+
+    skipped, previous, stored = asyncio.run(scenario())
+
+    assert skipped is None
+    assert previous["status"] == "completed"
+    assert stored["status"] == "closed"
@@ -0,0 +1,123 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import media
+import server
+from routes import MAX_LOOKUP_IDS
+
+
+@pytest.fixture
+def client():
+    with TestClient(server.app) as client:
+        yield client
+
+
+def create_item(client, title="Intro", **fields):
+    item = {"title": title, "client": "Ann", "type": "Video Scripts", "description": "d", "results": "r", **fields}
+    return client.post("/api/portfolio", json=item).json()["id"]
+
+
+def create_testimonial(client, name="Ann", **fields):
+    testimonial = {"name": name, "channel": "c", "subscribers": "10K", "testimonial": "t", "rating": 5, **fields}
+    return client.post("/api/testimonials", json=testimonial).json()["id"]
+
+
+def titles(lookup):
+    return [item and item["title"] for item in lookup["items"]]
+
+
+def test_lookup_keeps_request_order_and_duplicates(client):
+    a = create_item(client, "A")
+    b = create_item(client, "B")
+
+    response = client.get("/api/portfolio/lookup", params={"ids": f"{b},missing,{a},{b}"})
+
+    assert response.status_code == 200
+    assert titles(response.json()) == ["B", None, "A", "B"]
+    assert response.json()["missing"] == ["missing"]
+
+
+def test_lookup_accepts_repeated_ids_parameter(client):
+    a = create_item(client, "A")
+    b = create_item(client, "B")
+
+    response = client.get("/api/portfolio/lookup", params=[("ids", a), ("ids", b)])
+
+    assert titles(response.json()) == ["A", "B"]
+
+
+def test_lookup_caps_the_number_of_ids(client):
+    ids = ",".join(f"id{i}" for i in range(MAX_LOOKUP_IDS + 1))
+
+    assert client.get("/api/portfolio/lookup", params={"ids": ids}).status_code == 400
+    assert client.get("/api/testimonials/lookup", params={"ids": ids}).status_code == 400
+
+
+def test_inactive_items_are_hidden_unless_asked_for(client):
+    hidden = create_item(client, "Hidden", is_active=False)
+
+    assert client.get(f"/api/portfolio/{hidden}").status_code == 404
+    assert client.get(f"/api/portfolio/{hidden}", params={"active": "false"}).json()["title"] == "Hidden"
+    lookup = client.get("/api/portfolio/lookup", params={"ids": hidden}).json()
+    assert lookup == {"items": [None], "missing": [hidden]}
+    lookup = client.get("/api/portfolio/lookup", params={"ids": hidden, "active": "false"}).json()
+    assert titles(lookup) == ["Hidden"]
+
+
+def test_testimonial_lookups(client):
+    ann = create_testimonial(client, "Ann")
+    hidden = create_testimonial(client, "Bob", is_active=False)
+
+    assert client.get(f"/api/testimonials/{ann}").json()["name"] == "Ann"
+    assert client.get(f"/api/testimonials/{hidden}").status_code == 404
+    assert client.get("/api/testimonials/missing").status_code == 404
+    lookup = client.get("/api/testimonials/lookup", params={"ids": f"{hidden},{ann}"}).json()
+    assert [item and item["name"] for item in lookup["items"]] == [None, "Ann"]
+    assert lookup["missing"] == [hidden]
+
+
+# Each write below follows a read that put the item in the per-id cache
+
+
+def test_update_invalidates_cache(client):
+    item_id = create_item(client)
+    client.get(f"/api/portfolio/{item_id}")
+
+    client.put(f"/api/portfolio/{item_id}", json={"title": "Renamed"})
+
+    assert client.get(f"/api/portfolio/{item_id}").json()["title"] == "Renamed"
+    assert titles(client.get("/api/portfolio/lookup", params={"ids": item_id}).json()) == ["Renamed"]
+
+
+def test_delete_invalidates_cache(client):
+    item_id = create_item(client)
+    client.get(f"/api/portfolio/{item_id}")
+
+    client.delete(f"/api/portfolio/{item_id}")
+
+    assert client.get(f"/api/portfolio/{item_id}").status_code == 404
+
+
+def test_position_update_invalidates_cache(client):
+    first = create_item(client, "First")
+    second = create_item(client, "Second")
+    client.get(f"/api/portfolio/{second}")
+
+    response = client.put(f"/api/portfolio/{second}/position", json={"pinned": True})
+
+    assert response.status_code == 200
+    assert client.get(f"/api/portfolio/{second}").json()["pinned"] is True
+    assert client.get(f"/api/portfolio/{first}").json()["pinned"] is False
+
+
+def test_image_upload_invalidates_cache(client, monkeypatch):
+    async def process_image(data, settings):
+        return {"hash": "ab" * 32, "width": 10, "height": 10, "variants": []}
+
+    monkeypatch.setattr(media, "process_image", process_image)
+    item_id = create_item(client)
+    assert client.get(f"/api/portfolio/{item_id}").json().get("image") is None
+
+    client.post(f"/api/portfolio/{item_id}/image", files={"file": ("image.png", b"png", "image/png")})
+
+    assert client.get(f"/api/portfolio/{item_id}").json()["image"]["hash"] == "ab" * 32
@@ -0,0 +1,100 @@
+import asyncio
+import dataclasses
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+import media
+import routes
+import server
+from config import get_settings
+
+
+def png(width, height, color="red"):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def client():
+    with TestClient(server.app) as client:
+        yield client
+
+
+def create_item(client):
+    item = {"title": "Intro", "client": "Ann", "type": "Video Scripts", "description": "d", "results": "r"}
+    return client.post("/api/portfolio", json=item).json()["id"]
+
+
+def upload(client, item_id, data):
+    return client.post(f"/api/portfolio/{item_id}/image", files={"file": ("image.png", data, "image/png")})
+
+
+def test_upload_renders_variants(client):
+    response = upload(client, create_item(client), png(800, 400, "blue"))
+
+    assert response.status_code == 200
+    image = response.json()["image"]
+    assert (image["width"], image["height"]) == (800, 400)
+    # 1280 is never upscaled, so it collapses into the original width
+    assert {(v["width"], v["height"]) for v in image["variants"]} == {(320, 160), (640, 320), (800, 400)}
+    variant = image["variants"][0]["url"]
+    assert "immutable" in client.get(variant).headers["cache-control"]
+
+
+def test_upload_rejects_non_images(client):
+    response = upload(client, create_item(client), b"not an image")
+
+    assert response.status_code == 400
+
+
+def test_upload_rejects_large_files(client, monkeypatch):
+    settings = dataclasses.replace(get_settings(), media_max_upload_bytes=100)
+    monkeypatch.setattr(routes, "get_settings", lambda: settings)
+
+    response = upload(client, create_item(client), png(100, 100))
+
+    assert response.status_code == 413
+
+
+def test_upload_to_unknown_item(client):
+    assert upload(client, "missing", png(10, 10)).status_code == 404
+
+
+def test_pixel_limit_is_checked_before_decoding(tmp_path):
+    with pytest.warns(Image.DecompressionBombWarning), pytest.raises(ValueError, match="larger than"):
+        media._render_variants(png(8000, 6000), "ab" * 32, str(tmp_path), [320], ["jpeg"])
+    assert not any(tmp_path.iterdir())
+
+
+class CountingPool(ThreadPoolExecutor):
+    def __init__(self):
+        super().__init__(max_workers=2)
+        self.renders = 0
+
+    def submit(self, fn, *args, **kwargs):
+        self.renders += 1
+        return super().submit(fn, *args, **kwargs)
+
+
+def test_same_content_is_rendered_once(tmp_path, monkeypatch):
+    settings = dataclasses.replace(get_settings(), media_dir=str(tmp_path), media_formats=["jpeg"])
+    pool = CountingPool()
+    monkeypatch.setattr(media, "_get_pool", lambda settings: pool)
+    data = png(400, 300, "green")
+
+    async def scenario():
+        # Concurrent uploads share one render, later ones read the manifest
+        first, second = await asyncio.gather(media.process_image(data, settings), media.process_image(data, settings))
+        third = await media.process_image(data, settings)
+        return first, second, third
+
+    first, second, third = asyncio.run(scenario())
+    pool.shutdown()
+
+    assert first == second == third
+    assert pool.renders == 1
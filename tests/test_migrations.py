@@ -0,0 +1,40 @@
+from datetime import datetime
+
+import pytest
+
+import migrations
+
+
+@pytest.fixture(autouse=True)
+def nothing_completed(monkeypatch):
+    monkeypatch.setattr(migrations, "_completed", set())
+
+
+def test_upcast_applies_pending_migrations():
+    doc = {"_id": "abc", "created_at": datetime(2024, 1, 1), "title": "Intro"}
+    migrations.upcast("portfolio_items", doc)
+    assert doc["rank"]
+    assert doc["pinned"] is False
+    assert doc["tenant_id"] == "default"
+
+
+def test_upcast_parses_subscriber_count():
+    doc = migrations.upcast("testimonials", {"_id": "t", "subscribers": "1.2M"})
+    assert doc["subscriber_count"] == 1_200_000
+
+
+def test_upcast_keeps_current_fields():
+    doc = {"_id": "abc", "rank": "h", "pinned": True, "tenant_id": "acme"}
+    assert migrations.upcast("portfolio_items", dict(doc)) == doc
+
+
+def test_upcast_skips_completed_migrations():
+    migrations._completed.update(m.version for m in migrations.MIGRATIONS if m.collection == "testimonials")
+    doc = migrations.upcast("testimonials", {"_id": "t", "subscribers": "1.2M"})
+    assert "subscriber_count" not in doc
+    assert "tenant_id" not in doc
+
+
+def test_upcast_passes_none_and_other_collections_through():
+    assert migrations.upcast("portfolio_items", None) is None
+    assert migrations.upcast("unknown", {"_id": "x"}) == {"_id": "x"}
@@ -0,0 +1,24 @@
+import pytest
+
+from models import parse_subscriber_count
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("12,345", 12_345),
+    ("500K", 500_000),
+    ("1.2M+", 1_200_000),
+    ("89k subscribers", 89_000),
+    ("2 million", 2_000_000),
+    ("10Mil", 10_000_000),
+    ("3 thousand", 3_000),
+    ("1.5bn", 1_500_000_000),
+    ("10k-50k", 10_000),
+    ("500k+", 500_000),
+])
+def test_parse_subscriber_count(value, expected):
+    assert parse_subscriber_count(value) == expected
+
+
+@pytest.mark.parametrize("value", [None, "", "lots", "10 Mio", "5 mils", "2 millionen", "about 5k"])
+def test_parse_subscriber_count_rejects_unknown_forms(value):
+    assert parse_subscriber_count(value) is None
@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+from ranking import rank_between, rank_for_position
+
+
+@pytest.mark.parametrize("lo, hi", [
+    (None, None),
+    (None, "1"),
+    ("a", None),
+    ("a", "b"),
+    ("a", "a1"),
+    ("az", "b"),
+    ("zz", None),
+    (None, "01"),
+])
+def test_rank_between_is_strictly_between(lo, hi):
+    rank = rank_between(lo, hi)
+    assert lo is None or lo < rank
+    assert hi is None or rank < hi
+    assert not rank.endswith("0")
+
+
+def test_rank_between_rejects_unordered_bounds():
+    with pytest.raises(ValueError):
+        rank_between("b", "a")
+    with pytest.raises(ValueError):
+        rank_between("a", "a")
+
+
+def test_repeated_inserts_keep_order():
+    ranks = [rank_between(None, None)]
+    for _ in range(50):
+        ranks.insert(1, rank_between(ranks[0], ranks[1] if len(ranks) > 1 else None))
+    assert ranks == sorted(ranks)
+    assert len(set(ranks)) == len(ranks)
+
+
+class FakePortfolio:
+    """The parts of PortfolioRepository rank_for_position uses"""
+
+    def __init__(self, items):
+        self.items = {item["_id"]: item for item in items}
+
+    async def get(self, item_id):
+        return self.items.get(item_id)
+
+    async def adjacent_rank(self, pinned, exclude_id=None, above=None, below=None):
+        ranks = sorted(
+            item["rank"] for item in self.items.values()
+            if item["pinned"] == pinned and item["_id"] != exclude_id
+        )
+        if above is not None:
+            ranks = [rank for rank in ranks if rank > above]
+            return ranks[0] if ranks else None
+        if below is not None:
+            ranks = [rank for rank in ranks if rank < below]
+            return ranks[-1] if ranks else None
+        return ranks[0] if ranks else None
+
+
+@pytest.fixture
+def portfolio():
+    return FakePortfolio([
+        {"_id": "a", "rank": "h", "pinned": False},
+        {"_id": "b", "rank": "p", "pinned": False},
+        {"_id": "c", "rank": "t", "pinned": False},
+        {"_id": "x", "rank": "m", "pinned": True},
+    ])
+
+
+def position(portfolio, item_id, pinned=False, **neighbours):
+    return asyncio.run(rank_for_position(portfolio, item_id, pinned, **neighbours))
+
+
+def test_rank_for_position_top_of_group(portfolio):
+    assert position(portfolio, "c") < "h"
+
+
+def test_rank_for_position_after(portfolio):
+    assert "h" < position(portfolio, "c", after_id="a") < "p"
+
+
+def test_rank_for_position_before(portfolio):
+    assert "h" < position(portfolio, "c", before_id="b") < "p"
+
+
+def test_rank_for_position_between(portfolio):
+    assert "p" < position(portfolio, "a", after_id="b", before_id="c") < "t"
+
+
+def test_rank_for_position_after_last(portfolio):
+    assert position(portfolio, "a", after_id="c") > "t"
+
+
+def test_rank_for_position_unknown_neighbour(portfolio):
+    with pytest.raises(LookupError):
+        position(portfolio, "a", after_id="missing")
+
+
+def test_rank_for_position_other_group(portfolio):
+    with pytest.raises(ValueError):
+        position(portfolio, "a", after_id="x")
+
+
+def test_rank_for_position_wrong_order(portfolio):
+    with pytest.raises(ValueError):
+        position(portfolio, "a", after_id="c", before_id="b")
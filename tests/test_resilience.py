@@ -0,0 +1,145 @@
+import asyncio
+import time
+
+import pytest
+
+from resilience import CircuitBreaker, StorageUnavailable
+
+
+class Unreachable(Exception):
+    pass
+
+
+def make_breaker(**kwargs):
+    options = dict(failure_threshold=2, reset_timeout=10.0, call_timeout=1.0, transient_errors=(Unreachable,))
+    options.update(kwargs)
+    return CircuitBreaker(**options)
+
+
+async def ok():
+    return "ok"
+
+
+async def unreachable():
+    raise Unreachable()
+
+
+def call(breaker, fn):
+    return asyncio.run(breaker.call(fn))
+
+
+def expire(breaker):
+    breaker.opened_at = time.monotonic() - breaker.reset_timeout
+
+
+def test_opens_after_threshold():
+    breaker = make_breaker()
+    with pytest.raises(StorageUnavailable):
+        call(breaker, unreachable)
+    assert breaker.state == "closed"
+    with pytest.raises(StorageUnavailable):
+        call(breaker, unreachable)
+    assert breaker.state == "open"
+
+
+def test_open_breaker_fails_fast():
+    breaker = make_breaker(failure_threshold=1)
+    with pytest.raises(StorageUnavailable):
+        call(breaker, unreachable)
+    calls = []
+
+    async def tracked():
+        calls.append(1)
+
+    with pytest.raises(StorageUnavailable) as unavailable:
+        call(breaker, tracked)
+    assert calls == []
+    assert unavailable.value.status_code == 503
+    assert "Retry-After" in unavailable.value.headers
+
+
+def test_timeouts_count_as_failures():
+    breaker = make_breaker(failure_threshold=1, call_timeout=0.01)
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    with pytest.raises(StorageUnavailable):
+        call(breaker, slow)
+    assert breaker.state == "open"
+
+
+def test_other_errors_mean_storage_answered():
+    breaker = make_breaker()
+    with pytest.raises(StorageUnavailable):
+        call(breaker, unreachable)
+
+    async def invalid():
+        raise KeyError("duplicate")
+
+    with pytest.raises(KeyError):
+        call(breaker, invalid)
+    assert breaker.failures == 0
+
+
+def test_successful_probe_closes():
+    breaker = make_breaker(failure_threshold=1)
+    with pytest.raises(StorageUnavailable):
+        call(breaker, unreachable)
+    expire(breaker)
+    assert breaker.state == "half-open"
+    assert call(breaker, ok) == "ok"
+    assert breaker.state == "closed"
+
+
+def test_failed_probe_reopens():
+    breaker = make_breaker(failure_threshold=1)
+    with pytest.raises(StorageUnavailable):
+        call(breaker, unreachable)
+    expire(breaker)
+    with pytest.raises(StorageUnavailable):
+        call(breaker, unreachable)
+    assert breaker.state == "open"
+
+
+def test_one_probe_at_a_time():
+    breaker = make_breaker(failure_threshold=1)
+    with pytest.raises(StorageUnavailable):
+        call(breaker, unreachable)
+    expire(breaker)
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def held():
+            await release.wait()
+            return "ok"
+
+        probe = asyncio.create_task(breaker.call(held))
+        await asyncio.sleep(0)
+        with pytest.raises(StorageUnavailable):
+            await breaker.call(ok)
+        release.set()
+        assert await probe == "ok"
+
+    asyncio.run(scenario())
+    assert breaker.state == "closed"
+
+
+def test_cancelled_probe_leaves_breaker_open():
+    breaker = make_breaker(failure_threshold=1)
+    with pytest.raises(StorageUnavailable):
+        call(breaker, unreachable)
+    expire(breaker)
+
+    async def scenario():
+        probe = asyncio.create_task(breaker.call(asyncio.sleep, 1))
+        await asyncio.sleep(0)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+    asyncio.run(scenario())
+    assert breaker.opened_at is not None
+    assert breaker.state == "half-open"
+    assert call(breaker, ok) == "ok"
@@ -0,0 +1,118 @@
+import asyncio
+import dataclasses
+import json
+import os
+import time
+
+import pytest
+
+import repositories
+import snapshots
+import tenancy
+from config import get_settings
+
+HOUR = 3600
+
+
+def age(path, seconds):
+    stamp = time.time() - seconds
+    os.utime(path, (stamp, stamp))
+
+
+def test_write_uses_content_hashed_names(tmp_path):
+    first = snapshots.write({"stats": b"[1]"}, str(tmp_path), HOUR)
+    again = snapshots.write({"stats": b"[1]"}, str(tmp_path), HOUR)
+
+    filename = first["files"]["stats"]
+    assert filename.startswith("stats.") and filename.endswith(".json")
+    assert again["files"] == first["files"]
+    assert (tmp_path / filename).read_bytes() == b"[1]"
+    manifest = json.loads((tmp_path / snapshots.MANIFEST_NAME).read_text())
+    assert manifest["files"] == {"stats": filename}
+
+
+def test_write_keeps_files_superseded_within_retention(tmp_path):
+    old = snapshots.write({"stats": b"[1]"}, str(tmp_path), HOUR)["files"]["stats"]
+    # Current for two hours, longer than the retention
+    age(tmp_path / old, 2 * HOUR)
+
+    snapshots.write({"stats": b"[2]"}, str(tmp_path), HOUR)
+
+    assert (tmp_path / old).exists()
+
+
+def test_write_prunes_files_superseded_before_retention(tmp_path):
+    old = snapshots.write({"stats": b"[1]"}, str(tmp_path), HOUR)["files"]["stats"]
+    snapshots.write({"stats": b"[2]"}, str(tmp_path), HOUR)
+    age(tmp_path / old, 2 * HOUR)
+
+    current = snapshots.write({"stats": b"[2]"}, str(tmp_path), HOUR)["files"]["stats"]
+
+    assert not (tmp_path / old).exists()
+    assert (tmp_path / current).exists()
+
+
+def test_write_keeps_current_files_regardless_of_age(tmp_path):
+    current = snapshots.write({"stats": b"[1]"}, str(tmp_path), HOUR)["files"]["stats"]
+    age(tmp_path / current, 2 * HOUR)
+
+    snapshots.write({"stats": b"[1]", "testimonials": b"[]"}, str(tmp_path), HOUR)
+    snapshots.write({"stats": b"[1]", "testimonials": b"[]"}, str(tmp_path), 0)
+
+    assert (tmp_path / current).exists()
+
+
+@pytest.fixture
+def snapshot_settings(tmp_path, monkeypatch):
+    settings = dataclasses.replace(get_settings(), snapshot_dir=str(tmp_path), snapshot_debounce=0.01)
+    monkeypatch.setattr(snapshots, "get_settings", lambda: settings)
+    return settings
+
+
+def test_schedule_publish_debounces_per_tenant(snapshot_settings, monkeypatch):
+    published = []
+
+    async def publish():
+        published.append(tenancy.current_tenant())
+
+    monkeypatch.setattr(snapshots, "publish", publish)
+
+    async def scenario():
+        for _ in range(3):
+            snapshots.schedule_publish()
+        with tenancy.use("acme"):
+            snapshots.schedule_publish()
+        await asyncio.sleep(0.1)
+
+    asyncio.run(scenario())
+
+    assert sorted(published) == ["acme", "default"]
+
+
+def test_schedule_publish_is_off_without_snapshot_dir(monkeypatch):
+    monkeypatch.setattr(snapshots, "get_settings", lambda: dataclasses.replace(get_settings(), snapshot_dir=""))
+
+    async def scenario():
+        snapshots.schedule_publish()
+
+    asyncio.run(scenario())
+
+    assert not snapshots._dirty
+
+
+def test_publish_renders_public_content(snapshot_settings, tmp_path):
+    async def scenario():
+        try:
+            await repositories.get_storage().stats.insert(
+                {"_id": "s", "number": "12", "label": "Videos", "order": 0, "suffix": ""}
+            )
+            await snapshots.publish()
+            return await snapshots.read_manifest()
+        finally:
+            repositories.close_storage()
+
+    manifest = asyncio.run(scenario())
+
+    stats = json.loads((tmp_path / manifest["files"]["stats"]).read_text())
+    assert [stat["label"] for stat in stats] == ["Videos"]
+    assert json.loads((tmp_path / manifest["files"]["portfolio"]).read_text()) == []
@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI, Response
+from fastapi.testclient import TestClient
+
+from resilience import StaleWhileRevalidateMiddleware
+
+
+class Backend:
+    """Answers with the next queued status, then 200 with the current version"""
+
+    def __init__(self):
+        self.version = 1
+        self.failures = []
+        self.calls = 0
+
+
+async def settle(backend, calls):
+    """Wait for the background refresh to reach the route"""
+    for _ in range(100):
+        if backend.calls >= calls:
+            await asyncio.sleep(0.01)
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("no background refresh")
+
+
+@pytest.fixture
+def backend():
+    return Backend()
+
+
+@pytest.fixture
+def client(backend):
+    app = FastAPI()
+
+    @app.get("/api/portfolio")
+    async def portfolio(active: bool = True):
+        backend.calls += 1
+        if backend.failures:
+            return Response(status_code=backend.failures.pop(0))
+        return {"version": backend.version, "active": active}
+
+    @app.get("/api/contact")
+    async def contact():
+        return Response(status_code=503) if backend.failures else {"version": backend.version}
+
+    app.add_middleware(StaleWhileRevalidateMiddleware, max_entries=10)
+    with TestClient(app) as client:
+        yield client
+
+
+def test_failure_is_answered_with_the_last_good_response(client, backend):
+    assert client.get("/api/portfolio").json()["version"] == 1
+    backend.failures = [503, 503]
+
+    response = client.get("/api/portfolio")
+
+    assert response.status_code == 200
+    assert response.json()["version"] == 1
+    assert response.headers["warning"] == '110 - "Response is Stale"'
+    assert response.headers["age"] == "0"
+
+
+def test_failure_without_a_stored_response_passes_through(client, backend):
+    backend.failures = [503]
+
+    assert client.get("/api/portfolio").status_code == 503
+
+
+def test_client_errors_are_not_replaced(client, backend):
+    client.get("/api/portfolio")
+    backend.failures = [404]
+
+    assert client.get("/api/portfolio").status_code == 404
+
+
+def test_stale_response_is_revalidated_in_the_background(client, backend):
+    client.get("/api/portfolio")
+    backend.version = 2
+    # The request fails, the background refresh succeeds
+    backend.failures = [503]
+    assert client.get("/api/portfolio").json()["version"] == 1
+    client.portal.call(settle, backend, 3)
+
+    backend.failures = [503, 503]
+    response = client.get("/api/portfolio")
+
+    assert response.json()["version"] == 2
+    assert "warning" in response.headers
+
+
+def test_responses_are_kept_per_query(client, backend):
+    client.get("/api/portfolio", params={"active": "true"})
+    backend.failures = [503]
+
+    assert client.get("/api/portfolio").status_code == 503
+
+
+@pytest.mark.parametrize("value", ["false", "0", "no"])
+def test_inactive_listings_are_never_stored(client, backend, value):
+    client.get("/api/portfolio", params={"active": value})
+    backend.failures = [503]
+
+    assert client.get("/api/portfolio", params={"active": value}).status_code == 503
+
+
+def test_admin_routes_are_never_stored(client, backend):
+    client.get("/api/contact")
+    backend.failures = [503]
+
+    assert client.get("/api/contact").status_code == 503
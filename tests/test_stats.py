@@ -0,0 +1,83 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from repositories import get_storage
+
+
+@pytest.fixture
+def client():
+    with TestClient(server.app) as client:
+        yield client
+
+
+def add_stat(client, **fields):
+    stat = {"_id": "videos", "number": "12", "label": "Videos", "order": 0, "suffix": "", **fields}
+    client.portal.call(get_storage().stats.insert, stat)
+    return stat["_id"]
+
+
+def test_manual_number_edit(client):
+    stat_id = add_stat(client)
+
+    response = client.put(f"/api/stats/{stat_id}", json={"number": "15"})
+
+    assert response.status_code == 200
+    assert response.json()["number"] == "15"
+
+
+def test_bound_number_cannot_be_edited(client):
+    stat_id = add_stat(client, metric="active_portfolio_items")
+
+    response = client.put(f"/api/stats/{stat_id}", json={"number": "15", "label": "Clips"})
+
+    assert response.status_code == 409
+    assert client.get("/api/stats").json()[0]["label"] == "Videos"
+
+
+def test_binding_and_editing_number_at_once_is_rejected(client):
+    stat_id = add_stat(client)
+
+    response = client.put(f"/api/stats/{stat_id}", json={"number": "15", "metric": "active_portfolio_items"})
+
+    assert response.status_code == 409
+
+
+def test_binding_refreshes_number(client):
+    stat_id = add_stat(client)
+
+    response = client.put(f"/api/stats/{stat_id}", json={"metric": "active_portfolio_items"})
+
+    assert response.json()["metric"] == "active_portfolio_items"
+    assert response.json()["number"] == "0"
+
+
+def test_suffix_change_rerenders_bound_number(client):
+    stat_id = add_stat(client, metric="active_portfolio_items", number="0")
+
+    response = client.put(f"/api/stats/{stat_id}", json={"suffix": "+"})
+
+    assert response.json()["suffix"] == "+"
+    assert response.json()["number"] == "0+"
+
+
+def test_null_metric_unbinds(client):
+    stat_id = add_stat(client, metric="active_portfolio_items")
+
+    response = client.put(f"/api/stats/{stat_id}", json={"metric": None, "number": "15"})
+
+    assert response.status_code == 200
+    assert response.json()["metric"] is None
+    assert response.json()["number"] == "15"
+
+
+def test_other_fields_keep_the_binding(client):
+    stat_id = add_stat(client, metric="active_portfolio_items")
+
+    response = client.put(f"/api/stats/{stat_id}", json={"label": "Clips"})
+
+    assert response.json()["metric"] == "active_portfolio_items"
+
+
+def test_unknown_stat(client):
+    assert client.put("/api/stats/missing", json={"label": "Clips"}).status_code == 404
@@ -0,0 +1,61 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+import database
+import tenancy
+
+
+def item(item_id):
+    return {
+        "_id": item_id, "title": item_id, "type": "video", "is_active": True,
+        "pinned": False, "rank": "h", "created_at": datetime(2024, 1, 1),
+    }
+
+
+def test_tenants_see_only_their_documents(storage):
+    async def scenario():
+        await storage.prepare()
+        with tenancy.use("acme"):
+            await storage.portfolio.insert(item("acme-item"))
+        with tenancy.use("beta"):
+            await storage.portfolio.insert(item("beta-item"))
+
+            assert [doc["_id"] for doc in await storage.portfolio.list(active_only=True)] == ["beta-item"]
+            assert await storage.portfolio.get("acme-item") is None
+            assert [doc["_id"] for doc in await storage.portfolio.get_many(["acme-item", "beta-item"])] == ["beta-item"]
+            assert await storage.portfolio.update("acme-item", {"title": "taken"}) is None
+            assert await storage.portfolio.delete("acme-item") is None
+            assert await storage.portfolio.count_active() == 1
+        with tenancy.use("acme"):
+            acme_item = await storage.portfolio.get("acme-item")
+            assert acme_item["title"] == "acme-item"
+            assert acme_item["tenant_id"] == "acme"
+
+    asyncio.run(scenario())
+
+
+async def stored_counter_keys(storage):
+    if storage.name == "sqlite":
+        rows = await storage.run(lambda conn: conn.execute("SELECT name FROM counters").fetchall())
+        return {name for (name,) in rows}
+    return {counter["_id"] async for counter in database.get_db().counters.find({})}
+
+
+def test_counters_are_per_tenant(storage):
+    async def scenario():
+        await storage.prepare()
+        with tenancy.use("acme"):
+            await storage.stats.increment_counter("inquiries", 2)
+        with tenancy.use("beta"):
+            await storage.stats.increment_counter("inquiries", 5)
+        await storage.stats.increment_counter("inquiries", 7)
+
+        with tenancy.use("acme"):
+            assert await storage.stats.get_counters(["inquiries"]) == {"inquiries": 2}
+        assert await storage.stats.get_counters(["inquiries"]) == {"inquiries": 7}
+        # The default tenant keeps bare names, which single-tenant exports rely on
+        assert await stored_counter_keys(storage) == {"inquiries", "acme:inquiries", "beta:inquiries"}
+
+    asyncio.run(scenario())
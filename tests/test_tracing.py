@@ -0,0 +1,66 @@
+import pytest
+from fastapi import APIRouter, FastAPI, Response
+from fastapi.exceptions import ResponseValidationError
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+import tracing
+from tracing import TracedRoute, TracingMiddleware, tracer
+
+
+class Item(BaseModel):
+    name: str
+
+
+router = APIRouter(route_class=TracedRoute)
+
+
+@router.get("/model", response_model=Item)
+async def model():
+    return {"name": "ok"}
+
+
+@router.get("/raw", response_model=Item)
+async def raw():
+    return Response(b"raw")
+
+
+@router.get("/invalid", response_model=Item)
+async def invalid():
+    return {"title": "no name"}
+
+
+app = FastAPI()
+app.include_router(router)
+app.add_middleware(TracingMiddleware)
+
+
+@pytest.fixture
+def spans(monkeypatch):
+    exported = []
+    monkeypatch.setattr(tracer, "enabled", True)
+    monkeypatch.setattr(tracer, "sample_rate", 1.0)
+    monkeypatch.setattr(tracer, "export", exported.append)
+    return exported
+
+
+def names(spans):
+    return sorted(span.name for span in spans)
+
+
+def test_rendered_response(spans):
+    assert TestClient(app).get("/model").status_code == 200
+    assert names(spans) == ["GET /model", "handler model", "response.render", "response.validate"]
+
+
+def test_response_returned_by_the_handler(spans):
+    assert TestClient(app).get("/raw").text == "raw"
+    assert names(spans) == ["GET /raw", "handler raw", "response.validate"]
+
+
+def test_failed_validation(spans):
+    with pytest.raises(ResponseValidationError):
+        TestClient(app).get("/invalid")
+    validation = next(span for span in spans if span.name == "response.validate")
+    assert validation.error
+    assert tracing._validation_span.get() is None